@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from filters import CountFilter, GroupFilter, LangsFilter
+from randomizer import AvoidRepeatRandomizer, WeightedRandomizer
+from repeat_pl_br import WordsDict, WordsTestEngine
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'benchmarks_baseline.json')
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+GROUPS_RATIO = 50
+MAX_ALTERNATIVES = 3
+REGRESSION_TOLERANCE = 0.25
+LETTERS = u'abcdefghijklmnopqrstuvwxyzáãçéêíóõúąęłńóśźż'
+
+
+def make_word(rand):
+    return u''.join(rand.choice(LETTERS) for _ in range(rand.randint(3, 12)))
+
+
+def make_field(rand):
+    return u'|'.join(make_word(rand) for _ in range(rand.randint(1, MAX_ALTERNATIVES)))
+
+
+def generate_dictionary(path, rows, seed=0):
+    rand = random.Random(seed)
+    groups_count = max(1, rows // GROUPS_RATIO)
+    with open(path, u'wb') as dict_file:
+        dict_file.write('pl;br;en;group\n')
+        for _ in xrange(rows):
+            fields = [make_field(rand), make_field(rand), make_field(rand), u'group%d' % rand.randrange(groups_count)]
+            dict_file.write(u';'.join(fields).encode('utf-8') + '\n')
+
+
+def load_csv(path):
+    with open(path, u'rb') as csv_file:
+        return WordsDict(csv.reader(csv_file, delimiter=';'))
+
+
+def bench_load_csv(path, rows):
+    start = time.time()
+    words_dict = load_csv(path)
+    return len(words_dict), time.time() - start
+
+
+def bench_load_cached(path, rows):
+    start = time.time()
+    words_dict = WordsDict.from_file(path)
+    return len(words_dict), time.time() - start
+
+
+def bench_load_lazy(path, rows):
+    start = time.time()
+    words_dict = WordsDict.from_file(path, lazy=True)
+    return len(words_dict), time.time() - start
+
+
+def bench_filter_groups(path, rows):
+    words_dict = WordsDict.from_file(path)
+    groups = sorted(words_dict.get_groups())[:5]
+    repeats = 100
+    start = time.time()
+    for _ in xrange(repeats):
+        # The chain of the main program
+        words_dict.clear_filter()
+        words_dict.apply_filter(LangsFilter((u'pl', u'br')).link(
+            GroupFilter(set(groups)).link(CountFilter(len(words_dict) // 2))))
+    return repeats, time.time() - start
+
+
+def bench_filter_count(path, rows):
+    words_dict = WordsDict.from_file(path)
+    repeats = 100
+    start = time.time()
+    for _ in xrange(repeats):
+        words_dict.clear_filter()
+        words_dict.apply_filter(CountFilter(len(words_dict) // 10))
+    return repeats, time.time() - start
+
+
+def bench_draw(path, rows):
+    randomizer = AvoidRepeatRandomizer(0, rows - 1, seed=0)
+    start = time.time()
+    for _ in xrange(rows):
+        randomizer.next_random()
+    return rows, time.time() - start
+
+
+def bench_draw_weighted(path, rows):
+    randomizer = WeightedRandomizer(0, rows - 1, seed=0)
+    start = time.time()
+    for number in xrange(rows):
+        randomizer.record(randomizer.next_random(), number % 3 != 0)
+    return rows, time.time() - start
+
+
+def bench_reset(path, rows):
+    randomizer = AvoidRepeatRandomizer(0, rows - 1, seed=0)
+    repeats = 10000
+    start = time.time()
+    for _ in xrange(repeats):
+        randomizer.next_random()
+        randomizer.reset()
+    return repeats, time.time() - start
+
+
+def bench_grade(path, rows):
+    words_dict = WordsDict.from_file(path)
+    tests_engine = WordsTestEngine(words_dict, u'pl', u'br', seed=0)
+    rand = random.Random(0)
+    answers = [(words_dict[index], make_word(rand)) for index in xrange(len(words_dict))]
+    start = time.time()
+    for (dict_entry, answer) in answers:
+        tests_engine.get_error(dict_entry, answer)
+    return len(answers), time.time() - start
+
+
+def bench_suggest(path, rows):
+    words_dict = WordsDict.from_file(path)
+    words_dict.get_prefix_index(u'br')
+    rand = random.Random(0)
+    prefixes = [make_word(rand)[:rand.randint(1, 4)] for _ in xrange(10000)]
+    start = time.time()
+    for prefix in prefixes:
+        words_dict.suggest(prefix, u'br')
+        words_dict.lookup(prefix, [u'br'])
+    return len(prefixes), time.time() - start
+
+
+# (name, function, whether the compiled cache is filled in advance, so that parsing does not set the peak memory)
+BENCHMARKS = [
+    (u'load_csv', bench_load_csv, False),
+    (u'load_cached', bench_load_cached, True),
+    (u'load_lazy', bench_load_lazy, False),
+    (u'filter_groups', bench_filter_groups, True),
+    (u'filter_count', bench_filter_count, True),
+    (u'draw', bench_draw, False),
+    (u'draw_weighted', bench_draw_weighted, False),
+    (u'reset', bench_reset, False),
+    (u'grade', bench_grade, True),
+    (u'suggest', bench_suggest, True),
+]
+
+
+def fill_cache(path):
+    WordsDict.from_file(path)
+
+
+def run_isolated(benchmark, path, rows, results):
+    operations, elapsed = benchmark(path, rows)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((operations, elapsed, peak_kb))
+
+
+def run_benchmark(benchmark, dict_path, rows, cached, tmp_dir):
+    # Every run gets a fresh copy of the dictionary and its own process (own peak memory)
+    path = os.path.join(tmp_dir, u'run.csv')
+    shutil.copy(dict_path, path)
+    if cached:
+        process = multiprocessing.Process(target=fill_cache, args=(path,))
+        process.start()
+        process.join()
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_isolated, args=(benchmark, path, rows, results))
+    process.start()
+    operations, elapsed, peak_kb = results.get()
+    process.join()
+    for file_name in os.listdir(tmp_dir):
+        if file_name.startswith(u'run.csv'):
+            os.remove(os.path.join(tmp_dir, file_name))
+    return {
+        u'ops_per_s': operations / elapsed if elapsed else float(u'inf'),
+        u'peak_kb': peak_kb,
+    }
+
+
+def run_all(sizes, names):
+    results = {}
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            dict_path = os.path.join(tmp_dir, u'dict%d.csv' % size)
+            generate_dictionary(dict_path, size)
+            for (name, benchmark, cached) in BENCHMARKS:
+                if names and name not in names:
+                    continue
+                key = u'%s/%d' % (name, size)
+                results[key] = run_benchmark(benchmark, dict_path, size, cached, tmp_dir)
+                yield key, results[key]
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def load_baseline(path):
+    try:
+        with open(path, u'rb') as baseline_file:
+            return json.load(baseline_file)
+    except IOError:
+        return {}
+
+
+def compare(result, baseline_result):
+    '''Returns throughput and peak memory relative to the baseline, marking changes beyond the tolerance.'''
+    if not baseline_result:
+        return u''
+    speed = result[u'ops_per_s'] / baseline_result[u'ops_per_s']
+    memory = float(result[u'peak_kb']) / baseline_result[u'peak_kb']
+    markers = []
+    if speed < 1 - REGRESSION_TOLERANCE:
+        markers.append(u' SPEED REGRESSION')
+    if memory > 1 + REGRESSION_TOLERANCE:
+        markers.append(u' MEMORY REGRESSION')
+    return u'%6.2fx speed %6.2fx memory%s' % (speed, memory, u''.join(markers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=u'Benchmarks of dictionary load, filters, draws, grading and search.')
+    parser.add_argument(u'--sizes', type=int, nargs=u'+', default=DEFAULT_SIZES,
+                        help=u'numbers of dictionary rows (default: %(default)s)')
+    parser.add_argument(u'--only', nargs=u'+', choices=[name for (name, _, _) in BENCHMARKS],
+                        help=u'run only given benchmarks')
+    parser.add_argument(u'--baseline', default=BASELINE_FILE, help=u'baseline file (default: %(default)s)')
+    parser.add_argument(u'--save-baseline', action=u'store_true', help=u'store results as the new baseline')
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = 0
+    print u'%-22s %16s %12s  %s' % (u'benchmark', u'ops/s', u'peak KB', u'vs baseline')
+    for (key, result) in run_all(args.sizes, args.only):
+        results[key] = result
+        comparison = compare(result, baseline.get(key))
+        regressions += u'REGRESSION' in comparison
+        print u'%-22s %16.1f %12d  %s' % (key, result[u'ops_per_s'], result[u'peak_kb'], comparison)
+        sys.stdout.flush()
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, u'wb') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+
+    return 1 if regressions else 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+from bisect import bisect_left
+from itertools import izip
+
+from storage import make_index_array
+
+
+# Rows sampled from a bucket for every missing distractor - some may repeat already chosen answers
+SAMPLE_FACTOR = 3
+
+
+class DistractorIndex(object):
+    '''Rows of every group bucketed by the length of their first answer in one language.
+
+    Wrong options of a question are drawn from buckets of the question group closest to the length
+    of the correct answer, then from the whole dictionary if the group is too small.
+    '''
+
+    def __init__(self, store, lang, separator):
+        self.store = store
+        self.lang = lang
+        self.separator = separator
+        self.buckets = {None: {}}
+        values = store.iter_values(lang)
+        groups = store.iter_values(store.group_key)
+        for (row, (value, group)) in enumerate(izip(values, groups)):
+            length = len(self.get_option(value))
+            if not length:
+                continue
+            for buckets in (self.buckets.setdefault(group, {}), self.buckets[None]):
+                rows = buckets.get(length)
+                if rows is None:
+                    rows = buckets[length] = make_index_array()
+                rows.append(row)
+        self.lengths = {group: sorted(buckets) for (group, buckets) in self.buckets.iteritems()}
+
+    def get_option(self, value):
+        return value.split(self.separator, 1)[0].strip()
+
+    def select(self, group, answer, count, is_correct, rand):
+        '''Returns up to count distinct options of other rows, none of them accepted by is_correct.'''
+        chosen = []
+        if count <= 0:
+            return chosen
+        known = {answer.lower()}
+        for bucket_group in (group, None):
+            if bucket_group in self.buckets:
+                self.select_from(bucket_group, len(answer), count, known, is_correct, chosen, rand)
+            if len(chosen) >= count:
+                break
+        return chosen
+
+    def select_from(self, group, length, count, known, is_correct, chosen, rand):
+        buckets = self.buckets[group]
+        for bucket_length in self.iter_lengths(group, length):
+            rows = buckets[bucket_length]
+            missing = count - len(chosen)
+            for position in rand.sample(xrange(len(rows)), min(len(rows), missing * SAMPLE_FACTOR)):
+                option = self.get_option(self.store.get_value(rows[position], self.lang))
+                if option.lower() not in known:
+                    known.add(option.lower())
+                    if is_correct(option):
+                        continue
+                    chosen.append(option)
+                    if len(chosen) >= count:
+                        return
+
+    def iter_lengths(self, group, length):
+        '''Yields lengths of buckets of the group, the closest to the given length first.'''
+        lengths = self.lengths[group]
+        right = bisect_left(lengths, length)
+        left = right - 1
+        while left >= 0 or right < len(lengths):
+            if right >= len(lengths) or (left >= 0 and length - lengths[left] <= lengths[right] - length):
+                yield lengths[left]
+                left -= 1
+            else:
+                yield lengths[right]
+                right += 1
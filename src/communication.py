@@ -5,7 +5,19 @@
 import sys
 
 import i18n
-_ = i18n.language.ugettext
+from session import TerminalInput
+from utils import ConsoleOutput
+_ = i18n.ugettext
+
+
+test_input = TerminalInput()
+test_output = ConsoleOutput()
+
+
+def set_io(new_input=None, new_output=None):
+    global test_input, test_output
+    test_input = TerminalInput() if new_input is None else new_input
+    test_output = ConsoleOutput() if new_output is None else new_output
 
 
 class RepeatMode:
@@ -25,26 +37,34 @@ class RepeatMode:
         return RepeatMode.MAPPING[number]
 
 
-def get_test_parameters(words_dict):
-    tests_num = get_tests_num()
-    ask_lang, ans_lang = get_tests_lang(words_dict.get_langs())
-    groups = words_dict.get_groups()
-    chosen_groups = choose_groups(groups)
-    count = get_last_translations(len(words_dict))
+def get_test_parameters(words_dict, tests_num=None, ask_lang=None, ans_lang=None, chosen_groups=None, count=None):
+    '''Asks only for parameters which are not given.'''
+    if tests_num is None:
+        tests_num = get_tests_num()
+    if ask_lang is None or ans_lang is None:
+        ask_lang, ans_lang = get_tests_lang(words_dict.get_langs(), ask_lang, ans_lang)
+    if chosen_groups is None:
+        chosen_groups = choose_groups(words_dict.get_groups())
+    if count is None:
+        count = get_last_translations(len(words_dict))
 
     return (tests_num, ask_lang, ans_lang, chosen_groups, count, )
 
 
+def read_input(question):
+    test_output.flush()
+    return test_input.read(question)
+
+
 def get_int_in_range(question, min_val=-sys.maxint - 1, max_val=sys.maxint, default=None):
-    encoded_question = question.encode('utf-8') if isinstance(question, unicode) else question
-    answer_str = raw_input(encoded_question)
+    answer_str = read_input(question)
     if not answer_str and default is not None:
         answer = default
     else:
         try:
             answer = int(answer_str)
         except ValueError:
-            print u'Given value %s is not a number' % answer_str
+            test_output.write(u'Given value %s is not a number' % answer_str)
             raise
 
     if answer < min_val or max_val < answer:
@@ -60,27 +80,30 @@ def get_tests_num():
 
 
 def print_ask_languages(langs):
-    print _(u'Choose questions language')
+    test_output.write(_(u'Choose questions language'))
     for (i, lang) in enumerate(langs, 1):
-        print '%d) %s' % (i, lang)
+        test_output.write('%d) %s' % (i, lang))
 
 
 def print_ans_languages(langs):
-    print _(u'Choose answers language')
+    test_output.write(_(u'Choose answers language'))
     for (i, lang) in enumerate(langs, 1):
-        print '%d) %s' % (i, lang)
+        test_output.write('%d) %s' % (i, lang))
 
 
-def get_tests_lang(langs):
-    print_ask_languages(langs)
+def get_tests_lang(langs, ask_lang=None, ans_lang=None):
     question_msg = _(u'Choose option number: ')
-    ask_lang_index = get_int_in_range(question_msg, 1, len(langs)) - 1
-    ask_lang = langs[ask_lang_index]
-
-    possible_ans_langs = filter(lambda lang: lang != ask_lang, langs)
-    print_ans_languages(possible_ans_langs)
-    ans_lang_index = get_int_in_range(question_msg, 1, len(possible_ans_langs)) - 1
-    ans_lang = possible_ans_langs[ans_lang_index]
+    if ask_lang is None:
+        possible_ask_langs = filter(lambda lang: lang != ans_lang, langs)
+        print_ask_languages(possible_ask_langs)
+        ask_lang_index = get_int_in_range(question_msg, 1, len(possible_ask_langs)) - 1
+        ask_lang = possible_ask_langs[ask_lang_index]
+
+    if ans_lang is None:
+        possible_ans_langs = filter(lambda lang: lang != ask_lang, langs)
+        print_ans_languages(possible_ans_langs)
+        ans_lang_index = get_int_in_range(question_msg, 1, len(possible_ans_langs)) - 1
+        ans_lang = possible_ans_langs[ans_lang_index]
 
     return ask_lang, ans_lang
 
@@ -93,11 +116,11 @@ def get_last_translations(maximal_count):
 
 def choose_groups(groups_set):
     groups = list(groups_set)
-    print _(u'Which groups you want to examine (e.g. 1,3-5)? : ')
+    test_output.write(_(u'Which groups you want to examine (e.g. 1,3-5)? : '))
     for (num, group) in enumerate(groups, 1):
-        print '%d) %s' % (num, group)
+        test_output.write('%d) %s' % (num, group))
 
-    groups_str = raw_input(_(u'Groups: ').encode('utf-8'))
+    groups_str = read_input(_(u'Groups: '))
 
     split_groups = groups_str.split(u',')
     chosen_groups = set()
@@ -110,7 +133,7 @@ def choose_groups(groups_set):
             try:
                 group_nr = int(group_str) - 1
             except ValueError:
-                print u'Group number %s is not a number' % group_str
+                test_output.write(u'Group number %s is not a number' % group_str)
                 raise
             chosen_groups.add(groups[group_nr])
 
@@ -123,17 +146,17 @@ def parse_range(range_str):
         start = int(range_split[0]) - 1
         end = int(range_split[1]) - 1
     except ValueError:
-        print 'One of values %s, %s is not a number' % (range_split[0], range_split[1])
+        test_output.write('One of values %s, %s is not a number' % (range_split[0], range_split[1]))
         raise
     return start, end
 
 
 def print_repeat_mode():
-    print _(u'Do you want to repeat test?')
-    print _(u'1) Yes, with the same questions')
-    print _(u'2) Yes, with the same parameters, but questions drawn again')
-    print _(u'3) Yes, with different parameters')
-    print _(u'4) No')
+    test_output.write(_(u'Do you want to repeat test?'))
+    test_output.write(_(u'1) Yes, with the same questions'))
+    test_output.write(_(u'2) Yes, with the same parameters, but questions drawn again'))
+    test_output.write(_(u'3) Yes, with different parameters'))
+    test_output.write(_(u'4) No'))
 
 
 def choose_repeat_mode():
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import cPickle
+import hashlib
+import os
+import tempfile
+
+
+CACHE_VERSION = 7
+CACHE_SUFFIX = u'.cache'
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_cache_path(dict_path, langs=None, kind=None):
+    parts = [dict_path]
+    if langs:
+        parts.append(u'-'.join(langs))
+    if kind:
+        parts.append(kind)
+    return u'.'.join(parts) + CACHE_SUFFIX
+
+
+def get_file_hash(path):
+    file_hash = hashlib.md5()
+    with open(path, u'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK_SIZE), ''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_source_info(dict_path):
+    stat = os.stat(dict_path)
+    return {
+        u'size': stat.st_size,
+        u'mtime': stat.st_mtime,
+    }
+
+
+def is_fresh(dict_path, cached_source):
+    source = get_source_info(dict_path)
+    if source[u'size'] != cached_source[u'size']:
+        return False
+    if source[u'mtime'] == cached_source[u'mtime']:
+        return True
+    # Same size, different mtime (touch, checkout) - fall back to the content hash
+    return get_file_hash(dict_path) == cached_source[u'hash']
+
+
+def load(dict_path, langs=None, kind=None):
+    cache_path = get_cache_path(dict_path, langs, kind)
+    try:
+        with open(cache_path, u'rb') as cache_file:
+            cached = cPickle.load(cache_file)
+    except (IOError, OSError, EOFError, cPickle.UnpicklingError, ValueError):
+        return None
+
+    if cached.get(u'version') != CACHE_VERSION or not is_fresh(dict_path, cached[u'source']):
+        return None
+
+    return cached[u'compiled']
+
+
+def save(dict_path, compiled, langs=None, kind=None):
+    cache_path = get_cache_path(dict_path, langs, kind)
+    source = get_source_info(dict_path)
+    source[u'hash'] = get_file_hash(dict_path)
+    cached = {
+        u'version': CACHE_VERSION,
+        u'source': source,
+        u'compiled': compiled,
+    }
+
+    cache_dir = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=CACHE_SUFFIX)
+    except (IOError, OSError):
+        # Cache is only an optimization - read-only directories are fine
+        return False
+
+    try:
+        with os.fdopen(fd, u'wb') as tmp_file:
+            cPickle.dump(cached, tmp_file, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    return True
@@ -2,12 +2,63 @@
 # -*- coding: utf-8 -*-
 
 
+import heapq
+from itertools import chain, islice
+
+from storage import make_index_array
+
+
+GROUP_KEY = u'group'
+
+
+def all_indices_reversed(translations):
+    return reversed(xrange(len(translations)))
+
+
+def merge_reversed(index_arrays):
+    '''Merges sorted index arrays into one stream of indices in descending order.'''
+    if len(index_arrays) == 1:
+        return reversed(index_arrays[0])
+    negated = [(-index for index in reversed(indices)) for indices in index_arrays]
+    return (-index for index in heapq.merge(*negated))
+
+
 class NoFilter(object):
+    '''Filters select row indices instead of copying rows.
+
+    Linked filters are chained generators over indices walked from the most recent row backwards,
+    so the whole chain is evaluated in a single pass and stops as soon as the last filter is done.
+    '''
+
+    next_filter = None
+
     def __init__(self):
         pass
 
     def filter(self, translations):
-        return translations[:]
+        indices = self.select_indices(translations)
+        if indices is None:
+            return list(translations)
+        return [translations[index] for index in indices]
+
+    def select_indices(self, translations, indices=None):
+        '''Returns selected indices in ascending order, None when all the rows of translations are selected.'''
+        reversed_indices = None if indices is None else reversed(indices)
+        selected = self.select_reversed(translations, reversed_indices)
+        if selected is None:
+            return None
+        selected = make_index_array(selected)
+        selected.reverse()
+        return selected
+
+    def select_reversed(self, translations, indices=None):
+        # None stands for all the rows - it is passed on so that the next filters can use their indexes
+        return self.pass_on(translations, indices)
+
+    def pass_on(self, translations, indices):
+        if self.next_filter is None:
+            return indices
+        return self.next_filter.select_reversed(translations, indices)
 
     def link(self, next_filter):
         self.next_filter = next_filter
@@ -21,9 +72,16 @@ class CountFilter(NoFilter):
             raise ValueError(u'Maximal number of translations must be nonnegative')
         self.max_translations = max_translations
 
-    def filter(self, translations):
-        filtered = translations[-self.max_translations:]
-        return self.next_filter.filter(filtered)
+    def select_reversed(self, translations, indices=None):
+        if indices is None and isinstance(self.next_filter, GroupFilter) and hasattr(translations, u'query_rows'):
+            # Recent rows of the groups in one query of the database
+            min_row = max(0, len(translations) - self.max_translations)
+            selected = translations.query_rows(groups=self.next_filter.groups, min_row=min_row)
+            return self.next_filter.pass_on(translations, selected)
+
+        if indices is None:
+            indices = all_indices_reversed(translations)
+        return self.pass_on(translations, islice(indices, self.max_translations))
 
 
 class GroupFilter(NoFilter):
@@ -33,6 +91,48 @@ class GroupFilter(NoFilter):
             raise ValueError(u'Undefined groups')
         self.groups = groups
 
-    def filter(self, translations):
-        filtered = [translation for translation in translations if translation[u'group'] in self.groups]
-        return self.next_filter.filter(filtered)
+    def select_reversed(self, translations, indices=None):
+        if indices is None and hasattr(translations, u'query_rows'):
+            if isinstance(self.next_filter, CountFilter):
+                selected = translations.query_rows(groups=self.groups, limit=self.next_filter.max_translations)
+                return self.next_filter.pass_on(translations, selected)
+            return self.pass_on(translations, translations.query_rows(groups=self.groups))
+
+        if indices is None and hasattr(translations, u'get_group_rows'):
+            group_rows = [translations.get_group_rows(group) for group in self.groups]
+            selected = merge_reversed(group_rows) if group_rows else iter(())
+        else:
+            if indices is None:
+                indices = all_indices_reversed(translations)
+            if hasattr(translations, u'iter_groups'):
+                selected = (index for (index, group) in translations.iter_groups(indices) if group in self.groups)
+            else:
+                selected = (index for index in indices if self.get_group(translations, index) in self.groups)
+        return self.pass_on(translations, selected)
+
+    def get_group(self, translations, index):
+        return translations[index][GROUP_KEY]
+
+
+class LangsFilter(NoFilter):
+    '''Keeps rows having all given languages - only rows of sharded dictionaries can miss some.'''
+
+    def __init__(self, langs):
+        self.next_filter = NoFilter()
+        self.langs = langs
+
+    def select_reversed(self, translations, indices=None):
+        if not hasattr(translations, u'get_lang_ranges'):
+            return self.pass_on(translations, indices)
+
+        ranges = translations.get_lang_ranges(self.langs)
+        if sum(end - start for (start, end) in ranges) == len(translations):
+            # Every row has the languages - indices stay None, so the next filters can use their indexes
+            return self.pass_on(translations, indices)
+
+        if indices is None:
+            ranges = reversed(ranges)
+            selected = chain.from_iterable(reversed(xrange(start, end)) for (start, end) in ranges)
+        else:
+            selected = (index for index in indices if translations.has_langs(index, self.langs))
+        return self.pass_on(translations, selected)
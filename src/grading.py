@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import csv
+import sys
+
+import stats
+from repeat_pl_br import DICT_FILE, WordsDict, WordsTestEngine
+from storage import to_utf8
+
+
+RESULT_OK = u'ok'
+RESULT_ERROR = u'error'
+RESULT_UNKNOWN = u'unknown'
+
+
+def grade_answers(tests_engine, answers):
+    '''Grades (question, answer) pairs without any user interaction, yielding one result per pair.
+
+    Question is either an index of the engine dictionary entry or the question text in ask language,
+    unknown texts and indices out of range get the unknown result.
+    '''
+    for (question, answer) in answers:
+        if isinstance(question, (int, long)):
+            index = question if 0 <= question < len(tests_engine.words_dict) else None
+        else:
+            index = tests_engine.find_entry(question)
+        if index is None:
+            yield {
+                u'index': None,
+                u'question': unicode(question),
+                u'answer': answer,
+                u'result': RESULT_UNKNOWN,
+                u'expected': [],
+            }
+            continue
+
+        dict_entry = tests_engine.get_dict_entry(index)
+        error = tests_engine.get_error(dict_entry, answer)
+        yield {
+            u'index': index,
+            u'question': dict_entry[tests_engine.ask_lang],
+            u'answer': answer,
+            u'result': RESULT_ERROR if error else RESULT_OK,
+            u'expected': error[u'expected'] if error else [],
+        }
+
+
+def read_answers(answers_file, delimiter=';'):
+    for line in csv.reader(answers_file, delimiter=delimiter):
+        if not line:
+            continue
+        if len(line) != 2:
+            raise ValueError(u'Wrong answer line %s - expected question and answer' % (line,))
+        question, answer = [to_utf8(field) for field in line]
+        yield (int(question) if question.isdigit() else question), answer
+
+
+def write_results(results, results_file, delimiter=';'):
+    writer = csv.writer(results_file, delimiter=delimiter)
+    for result in results:
+        index = u'' if result[u'index'] is None else unicode(result[u'index'])
+        fields = [index, result[u'question'], result[u'answer'], result[u'result'],
+                  WordsDict.ALTERNATIVES_SEPARATOR.join(result[u'expected'])]
+        writer.writerow([field.encode('utf-8') for field in fields])
+
+
+def open_file(path, mode, default):
+    return default if path == u'-' else open(path, mode)
+
+
+def check_arguments(parser, args, words_dict):
+    langs = words_dict.get_langs()
+    for lang in (args.ask_lang, args.ans_lang):
+        if lang not in langs:
+            parser.error(u'unknown language %s, choose from: %s' % (lang, u', '.join(langs)))
+    if args.ask_lang == args.ans_lang:
+        parser.error(u'questions and answers languages must differ')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=u'Grades answers read from a file against the dictionary.')
+    parser.add_argument(u'ask_lang')
+    parser.add_argument(u'ans_lang')
+    parser.add_argument(u'--dict', default=DICT_FILE, help=u'dictionary file (default: %(default)s)')
+    parser.add_argument(u'--answers', default=u'-',
+                        help=u'file with "question;answer" lines, question is an entry number or text '
+                             u'(default: standard input)')
+    parser.add_argument(u'--results', default=u'-', help=u'file for results (default: standard output)')
+    stats.add_arguments(parser)
+    args = parser.parse_args(argv)
+    stats.enable_from_args(args)
+
+    words_dict = WordsDict.from_path(args.dict)
+    check_arguments(parser, args, words_dict)
+    tests_engine = WordsTestEngine(words_dict, args.ask_lang, args.ans_lang)
+    answers_file = open_file(args.answers, u'rb', sys.stdin)
+    results_file = open_file(args.results, u'wb', sys.stdout)
+    try:
+        write_results(grade_answers(tests_engine, read_answers(answers_file)), results_file)
+    finally:
+        for opened_file in (answers_file, results_file):
+            if opened_file not in (sys.stdin, sys.stdout):
+                opened_file.close()
+
+
+if __name__ == u'__main__':
+    main()
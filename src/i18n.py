@@ -11,19 +11,52 @@ APP_NAME = 'Bomdia'
 APP_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 LOCALE_DIR = os.path.join(APP_DIR, 'i18n')
 
-DEFAULT_LANGUAGES = os.environ.get('LANG', '').split(':')
 DEFAULT_LANGUAGES = ['en_US']
 
-lc, encoding = locale.getdefaultlocale()
-if lc:
-    languages = [lc]
+# Catalogs are loaded on the first translated text, not on import, and kept per language
+translations = {}
+current_language = None
 
-languages += DEFAULT_LANGUAGES
-mo_location = LOCALE_DIR
 
-gettext.install(True, localedir=None, unicode=1)
-gettext.find(APP_NAME, mo_location)
-gettext.textdomain(APP_NAME)
-gettext.bind_textdomain_codeset(APP_NAME, 'UTF-8')
+def get_system_languages():
+    try:
+        lc, encoding = locale.getdefaultlocale()
+    except ValueError:
+        lc = None
+    return ([lc] if lc else []) + DEFAULT_LANGUAGES
 
-language = gettext.translation(APP_NAME, mo_location, languages=languages, fallback=True)
+
+def get_translation(language=None):
+    '''Returns the catalog of the language (None - the system one), loading it only once.'''
+    translation = translations.get(language)
+    if translation is None:
+        languages = get_system_languages() if language is None else [language] + DEFAULT_LANGUAGES
+        translation = gettext.translation(APP_NAME, LOCALE_DIR, languages=languages, fallback=True)
+        translations[language] = translation
+    return translation
+
+
+def set_language(language):
+    '''Changes the language of the whole program, None restores the system one.'''
+    global current_language
+    current_language = language
+
+
+def ugettext(message):
+    return get_translation(current_language).ugettext(message)
+
+
+def N_(message):
+    '''Marks a text to be translated later, with the language of whoever shows it.'''
+    return message
+
+
+class Translator(object):
+    '''ugettext bound to a single language - for sessions of users speaking different languages.'''
+
+    def __init__(self, language=None):
+        self.language = language
+
+    def __call__(self, message):
+        language = current_language if self.language is None else self.language
+        return get_translation(language).ugettext(message)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import cStringIO
+import csv
+import multiprocessing
+import sys
+
+import dict_cache
+from repeat_pl_br import WordsDict
+from storage import ColumnStore, check_header, ends_quoted, select_columns, to_utf8
+
+
+CHUNK_LINES = 20000
+FIRST_LINE_NUM = 2
+QUOTE = '"'
+
+
+def read_chunks(lines, chunk_lines=CHUNK_LINES):
+    '''Yields (first line number, raw text) chunks of lines, a record with quoted line breaks is never split.'''
+    chunk = []
+    first_line_num = line_num = FIRST_LINE_NUM
+    record = ''
+    for line in lines:
+        chunk.append(line)
+        line_num += 1
+        record += line
+        if QUOTE in record and ends_quoted(record):
+            continue
+        record = ''
+        if len(chunk) >= chunk_lines:
+            yield first_line_num, ''.join(chunk)
+            chunk = []
+            first_line_num = line_num
+    if chunk:
+        yield first_line_num, ''.join(chunk)
+
+
+def parse_chunk(arguments):
+    '''Returns a store of the chunk rows and a list of (line number, message) errors.
+
+    The store is not built (None) when any line of the chunk is malformed.
+    '''
+    header, columns, first_line_num, data = arguments
+    rows = []
+    errors = []
+    csv_reader = csv.reader(cStringIO.StringIO(data), delimiter=';')
+    try:
+        for line in csv_reader:
+            line_num = first_line_num + csv_reader.line_num - 1
+            if len(header) != len(line):
+                errors.append((line_num, u'WordsDict - wrong fields (%s) number in line %d.' % (line, line_num)))
+                continue
+            try:
+                rows.append([to_utf8(line[column]) for column in columns])
+            except UnicodeDecodeError:
+                errors.append((line_num, u'WordsDict - not UTF-8 text in line %d.' % (line_num,)))
+    except csv.Error as error:
+        line_num = first_line_num + csv_reader.line_num - 1
+        errors.append((line_num, u'WordsDict - %s in line %d.' % (error, line_num)))
+
+    if errors:
+        return None, errors
+    selected_header = [header[column] for column in columns]
+    return ColumnStore.from_rows(selected_header, WordsDict.GROUP_KEY, rows), errors
+
+
+def import_dictionary(path, langs=None, processes=None, chunk_lines=CHUNK_LINES, save=True):
+    '''Parses and validates the file in chunks across a pool of processes.
+
+    Returns the loaded dictionary (None if the file has malformed lines) and all the errors found.
+    With save the dictionary is written to the compiled cache, so the next WordsDict.from_file is fast.
+    '''
+    with open(path, u'rb') as dict_file:
+        try:
+            header = next(csv.reader(dict_file, delimiter=';'))
+        except StopIteration:
+            raise ValueError(u'WordsDict - empty file')
+        check_header(header, WordsDict.GROUP_KEY)
+        columns = select_columns(header, WordsDict.GROUP_KEY, langs)
+
+        chunks = ((header, columns, first_line_num, data)
+                  for (first_line_num, data) in read_chunks(dict_file, chunk_lines))
+        if processes == 1:
+            parsed = map(parse_chunk, chunks)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                parsed = pool.map(parse_chunk, chunks)
+            finally:
+                pool.close()
+                pool.join()
+
+    errors = [error for (_, chunk_errors) in parsed for error in chunk_errors]
+    if errors:
+        return None, errors
+
+    selected_header = [header[column] for column in columns]
+    stores = [store for (store, _) in parsed]
+    words_dict = WordsDict.from_store(ColumnStore.joined(selected_header, WordsDict.GROUP_KEY, stores))
+    compiled = words_dict.compile(langs[1:] if langs else None, langs[:1] if langs else None)
+    words_dict.alternatives = compiled[u'alternatives']
+    if save:
+        dict_cache.save(path, compiled, langs)
+    return words_dict, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=u'Validates a dictionary file in parallel and compiles it '
+                                                 u'for fast loading.')
+    parser.add_argument(u'dict', help=u'dictionary file')
+    parser.add_argument(u'--langs', nargs=u'+', help=u'load only given languages, the first one is asked')
+    parser.add_argument(u'--processes', type=int, help=u'number of parsing processes (default: CPU count)')
+    parser.add_argument(u'--chunk-lines', type=int, default=CHUNK_LINES,
+                        help=u'lines parsed by a process at once (default: %(default)s)')
+    parser.add_argument(u'--check', action=u'store_true', help=u'only validate, do not write the compiled file')
+    args = parser.parse_args(argv)
+
+    words_dict, errors = import_dictionary(args.dict, args.langs, args.processes, args.chunk_lines,
+                                           save=not args.check)
+    for (_, message) in errors:
+        print >> sys.stderr, message.encode('utf-8')
+    if errors:
+        print >> sys.stderr, u'%d malformed lines' % (len(errors),)
+        return 1
+
+    print u'%d rows, %d groups - OK' % (len(words_dict), len(words_dict.get_groups()))
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unicodedata
+
+
+PORTUGUESE_ARTICLES = frozenset([u'o', u'a', u'os', u'as', u'um', u'uma', u'uns', u'umas'])
+ENGLISH_ARTICLES = frozenset([u'the', u'a', u'an'])
+
+ARTICLES = {
+    u'br': PORTUGUESE_ARTICLES,
+    u'pt': PORTUGUESE_ARTICLES,
+    u'portugalski': PORTUGUESE_ARTICLES,
+    u'en': ENGLISH_ARTICLES,
+    u'angielski': ENGLISH_ARTICLES,
+}
+
+# Letters without a canonical decomposition into a base letter and a combining mark
+FOLDED_LETTERS = {
+    ord(u'ł'): u'l',
+    ord(u'Ł'): u'L',
+    ord(u'ø'): u'o',
+    ord(u'Ø'): u'O',
+    ord(u'ß'): u'ss',
+}
+
+
+def fold_diacritics(text):
+    decomposed = unicodedata.normalize(u'NFKD', text.translate(FOLDED_LETTERS))
+    return u''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def bounded_edit_distance(first, second, max_distance):
+    '''Levenshtein distance between given texts, or max_distance + 1 if it is bigger than max_distance.'''
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    if len(first) > len(second):
+        first, second = second, first
+
+    # Only cells at most max_distance away from the diagonal can stay within the bound
+    too_far = max_distance + 1
+    previous = [j if j <= max_distance else too_far for j in xrange(len(first) + 1)]
+    for (i, second_char) in enumerate(second, 1):
+        low = max(1, i - max_distance)
+        high = min(len(first), i + max_distance)
+        current = [too_far] * (len(first) + 1)
+        if i <= max_distance:
+            current[0] = i
+        for j in xrange(low, high + 1):
+            cost = 0 if first[j - 1] == second_char else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[low - 1:high + 1]) > max_distance:
+            return too_far
+        previous = current
+
+    return min(previous[-1], too_far)
+
+
+class AnswerMatcher(object):
+    def __init__(self, fold_accents=False, strip_articles=False, max_distance=0, articles=None):
+        if max_distance < 0:
+            raise ValueError(u'Maximal edit distance must be nonnegative')
+        self.fold_accents = fold_accents
+        self.strip_articles = strip_articles
+        self.max_distance = max_distance
+        self.articles = ARTICLES if articles is None else articles
+
+    def normalize(self, text, lang):
+        normalized = text.lower()
+        if self.fold_accents:
+            normalized = fold_diacritics(normalized)
+        if self.strip_articles:
+            words = normalized.split(None, 1)
+            if len(words) == 2 and words[0] in self.articles.get(lang, ()):
+                normalized = words[1]
+            normalized = u' '.join(normalized.split())
+        return normalized
+
+    def matches(self, normalized_answer, accepted_answers):
+        if normalized_answer in accepted_answers:
+            return True
+        if self.max_distance:
+            for accepted_answer in accepted_answers:
+                if bounded_edit_distance(normalized_answer, accepted_answer, self.max_distance) <= self.max_distance:
+                    return True
+        return False
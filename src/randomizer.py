@@ -1,39 +1,249 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import heapq
+import json
+import math
+import os
 import random
-
-random.seed()
+import time
+from array import array
 
 
 class SimpleRandomizer(object):
-    def __init__(self, first, last):
-        random.seed()
+    def __init__(self, first, last, seed=None):
+        self.random = random.Random(seed)
         self.first = first
         self.last = last
 
     def next_random(self):
-        return random.randint(self.first, self.last)
+        return self.random.randint(self.first, self.last)
 
     def reset(self):
         pass
 
 
 class AvoidRepeatRandomizer(SimpleRandomizer):
+    '''Draws numbers without repetition until all of them are used.
+
+    It is a Fisher-Yates shuffle materialized lazily - only the swapped positions are remembered,
+    so reset is O(1) and memory grows with the number of draws, not with the range.
+    '''
+
     def __init__(self, first, last, *args, **kwargs):
         super(AvoidRepeatRandomizer, self).__init__(first, last, *args, **kwargs)
         self.reset()
 
     def next_random(self):
-        if len(self.free_numbers) == 0:
+        if self.remaining == 0:
             self.reset()
 
-        index = random.randint(0, len(self.free_numbers) - 1)
-        random_number = self.free_numbers[index]
-        self.free_numbers[index] = self.free_numbers[-1]
-        self.free_numbers.pop()
+        index = self.random.randrange(self.remaining)
+        self.remaining -= 1
+        random_number = self.swapped.get(index, index)
+        self.swapped[index] = self.swapped.pop(self.remaining, self.remaining)
 
-        return random_number
+        return self.first + random_number
 
     def reset(self):
-        self.free_numbers = range(self.first, self.last + 1)
+        self.swapped = {}
+        self.remaining = self.last - self.first + 1
+
+
+class SpacedRepetitionRandomizer(AvoidRepeatRandomizer):
+    '''Scheduler in the spirit of SM-2 choosing entries that are due for a review first.
+
+    Reviewed entries wait in a heap ordered by due time shortened by the past error rate (an entry answered
+    wrong half of the time comes back after half of its interval), entries never seen
+    are drawn without repetition like in AvoidRepeatRandomizer. Entries are remembered under keys
+    given by key function (bound by WordsTestEngine), so the state can be saved and used in next runs.
+    '''
+
+    DAY = 24 * 60 * 60
+    RETRY_DELAY = 60
+    INITIAL_EASE = 2.5
+    MINIMAL_EASE = 1.3
+    EASE_PENALTY = 0.2
+
+    # Item state fields
+    DUE, INTERVAL, EASE, STREAK, REVIEWS, ERRORS = range(6)
+
+    def __init__(self, first, last, seed=None, path=None, clock=time.time):
+        super(SpacedRepetitionRandomizer, self).__init__(first, last, seed)
+        self.path = path
+        self.clock = clock
+        self.items = load_state(path) if path else {}
+        self.queue = []
+        self.key_function = unicode
+
+    def bind(self, key_function):
+        self.key_function = key_function
+        self.queue = []
+        if self.items:
+            for number in xrange(self.first, self.last + 1):
+                item = self.items.get(key_function(number))
+                if item is not None:
+                    self.queue.append(self.make_queue_entry(item, number))
+            heapq.heapify(self.queue)
+
+    def next_random(self):
+        number = self.pop_due(self.clock())
+        if number is None:
+            number = self.draw_new()
+        if number is None:
+            number = self.pop_due(float(u'inf'))
+        if number is None:
+            number = super(SpacedRepetitionRandomizer, self).next_random()
+        return number
+
+    def pop_due(self, now):
+        while self.queue and self.queue[0][0] <= now:
+            _, _, due, number = heapq.heappop(self.queue)
+            item = self.items.get(self.key_function(number))
+            if item is not None and item[self.DUE] == due:
+                return number
+        return None
+
+    def draw_new(self):
+        while self.remaining:
+            number = super(SpacedRepetitionRandomizer, self).next_random()
+            if self.key_function(number) not in self.items:
+                return number
+        return None
+
+    def record(self, number, correct):
+        now = self.clock()
+        key = self.key_function(number)
+        item = self.items.get(key)
+        if item is None:
+            item = self.items[key] = [now, 0, self.INITIAL_EASE, 0, 0, 0]
+
+        item[self.REVIEWS] += 1
+        if correct:
+            item[self.STREAK] += 1
+            if item[self.STREAK] == 1:
+                item[self.INTERVAL] = 1
+            elif item[self.STREAK] == 2:
+                item[self.INTERVAL] = 6
+            else:
+                item[self.INTERVAL] = int(round(item[self.INTERVAL] * item[self.EASE]))
+            item[self.DUE] = now + item[self.INTERVAL] * self.DAY
+        else:
+            item[self.STREAK] = 0
+            item[self.INTERVAL] = 0
+            item[self.EASE] = max(self.MINIMAL_EASE, item[self.EASE] - self.EASE_PENALTY)
+            item[self.ERRORS] += 1
+            item[self.DUE] = now + self.RETRY_DELAY
+
+        heapq.heappush(self.queue, self.make_queue_entry(item, number))
+
+    def make_queue_entry(self, item, number):
+        error_rate = float(item[self.ERRORS]) / item[self.REVIEWS] if item[self.REVIEWS] else 0.0
+        priority = item[self.DUE] - error_rate * item[self.INTERVAL] * self.DAY
+        return (priority, -error_rate, item[self.DUE], number)
+
+    def save(self):
+        if self.path:
+            save_state(self.path, self.items)
+
+
+class FenwickTree(object):
+    '''Prefix sums of weights with O(log n) weight changes and O(log n) search of a sum position.'''
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.tree = array('d', [0.0])
+        self.tree.extend(weights)
+        for position in xrange(1, self.size + 1):
+            parent = position + (position & -position)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[position]
+        self.total = math.fsum(weights)
+        self.top_step = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, index, delta):
+        self.total += delta
+        position = index + 1
+        while position <= self.size:
+            self.tree[position] += delta
+            position += position & -position
+
+    def find(self, value):
+        '''Returns the first index whose prefix sum (including it) exceeds the value.'''
+        position = 0
+        step = self.top_step
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= value:
+                position = next_position
+                value -= self.tree[next_position]
+            step >>= 1
+        # Rounding errors of many updates may leave a value over the last sum
+        return min(position, self.size - 1)
+
+
+class WeightedRandomizer(SimpleRandomizer):
+    '''Draws numbers with probability proportional to weights, which grow with errors of the current run.
+
+    The weight of a number is BASE_WEIGHT + ERROR_WEIGHT * error rate, where the error rate counts
+    answers recorded since the start, with a past error rate (set_error_rates) as one extra answer.
+    Weights are kept in a Fenwick tree, so a recorded answer changes the next draw in O(log n).
+    '''
+
+    BASE_WEIGHT = 1.0
+    ERROR_WEIGHT = 4.0
+
+    def __init__(self, first, last, seed=None):
+        super(WeightedRandomizer, self).__init__(first, last, seed)
+        self.past_error_rates = {}
+        self.answers = {}
+        self.errors = {}
+        self.weights = array('d', [self.BASE_WEIGHT]) * (last - first + 1)
+        self.tree = FenwickTree(self.weights)
+
+    def next_random(self):
+        return self.first + self.tree.find(self.random.random() * self.tree.total)
+
+    def set_error_rates(self, error_rates):
+        '''Sets past error rates of numbers ({number: rate}), rebuilding all the weights in O(n).'''
+        self.past_error_rates = dict(error_rates)
+        for number in xrange(self.first, self.last + 1):
+            self.weights[number - self.first] = self.get_weight(number)
+        self.tree = FenwickTree(self.weights)
+
+    def record(self, number, correct):
+        self.answers[number] = self.answers.get(number, 0) + 1
+        if not correct:
+            self.errors[number] = self.errors.get(number, 0) + 1
+        self.set_weight(number, self.get_weight(number))
+
+    def get_weight(self, number):
+        past_error_rate = self.past_error_rates.get(number)
+        answers = self.answers.get(number, 0)
+        errors = self.errors.get(number, 0)
+        if past_error_rate is not None:
+            answers += 1
+            errors += past_error_rate
+        error_rate = float(errors) / answers if answers else 0.0
+        return self.BASE_WEIGHT + self.ERROR_WEIGHT * error_rate
+
+    def set_weight(self, number, weight):
+        index = number - self.first
+        self.tree.add(index, weight - self.weights[index])
+        self.weights[index] = weight
+
+
+def load_state(path):
+    try:
+        with open(path, u'rb') as state_file:
+            return json.load(state_file)
+    except (IOError, ValueError):
+        # Missing or corrupt state - the reviews start again
+        return {}
+
+
+def save_state(path, state):
+    tmp_path = path + u'.tmp'
+    with open(tmp_path, u'wb') as state_file:
+        json.dump(state, state_file)
+    os.rename(tmp_path, path)
@@ -2,18 +2,39 @@
 # -*- coding: utf-8 -*-
 
 
+import argparse
 import csv
-
-from filters import CountFilter, GroupFilter
-from communication import get_test_parameters, choose_repeat_mode, RepeatMode
-from randomizer import AvoidRepeatRandomizer, SimpleRandomizer
-from utils import get_fake_file, print_error, print_info, print_ok
+import functools
+import hashlib
+import multiprocessing
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+
+import dict_cache
+import stats
+from choices import DistractorIndex
+from filters import CountFilter, GroupFilter, LangsFilter
+from matching import AnswerMatcher
+from communication import get_test_parameters, choose_repeat_mode, set_io, RepeatMode
+from randomizer import AvoidRepeatRandomizer, SimpleRandomizer, SpacedRepetitionRandomizer, WeightedRandomizer
+from results_log import ResultsLog, load_error_rates
+from session import TerminalInput, TestSession
+from sqlite_store import SQLITE_SUFFIX, SqliteStore
+from storage import (AlternativesTable, ColumnStore, LazyCsvStore, PrefixIndex, ShardedAlternatives, ShardedStore,
+                     check_header, find_homographs, make_index_array, select_columns, split_alternatives,
+                     to_utf8)
+from utils import ConsoleOutput, JsonLinesOutput, get_fake_file
 
 import i18n
-_ = i18n.language.ugettext
+_ = i18n.ugettext
 
 
 DICT_FILE = u'translations.csv'
+RESULTS_LOG_FILE = u'results.log'
+SPACED_STATE_FILE = u'spaced.json'
 
 '''
 1. Złączony słownik budowany dla wybranej pary języków, nie dla wszystkich od razu.
@@ -22,57 +43,171 @@ DICT_FILE = u'translations.csv'
 4. W złączonym słowniku nie ma symboli "|" w języku źródłowym.
 TODO:
 - nowy format tłumaczeń
-- przy odpowiedziach z wieloma tłumaczeniami, podawać alternatywy
 '''
 
 
-class WordsDict:
+class WordsDict(object):
     GROUP_KEY = u'group'
+    ALTERNATIVES_SEPARATOR = u'|'
+    SUGGESTIONS_LIMIT = 10
 
-    def __init__(self, csv_reader):
-        self.all_translations = []
+    def __init__(self, csv_reader, langs=None):
         try:
-            self.header = next(csv_reader)
+            header = next(csv_reader)
         except StopIteration:
             raise ValueError(u'WordsDict - empty file')
 
-        if self.GROUP_KEY not in self.header:
-            raise ValueError(u'WordsDict - incorrect header - missing %s field' % (self.GROUP_KEY,))
+        check_header(header, self.GROUP_KEY)
+        columns = select_columns(header, self.GROUP_KEY, langs)
+        self.header = [header[column] for column in columns]
+        self.set_store(ColumnStore.from_rows(self.header, self.GROUP_KEY, self.read_lines(csv_reader, header, columns)))
+        self.alternatives = {}
 
-        for (i, line) in enumerate(csv_reader, 1):
-            if len(self.header) != len(line):
+    def read_lines(self, csv_reader, header, columns):
+        for line in csv_reader:
+            if len(header) != len(line):
                 line_num = csv_reader.line_num
                 raise ValueError(u'WordsDict - wrong fields (%s) number in line %d.' % (line, line_num))
 
-            unicode_line = [self.to_utf8(field) for field in line]
-            translation = dict(zip(self.header, unicode_line))
-            self.all_translations.append(translation)
-        self.translations = self.all_translations[:]
+            yield [self.to_utf8(line[column]) for column in columns]
+
+    def set_store(self, store):
+        self.store = store
+        self.prefix_indexes = {}
+        self.homographs_indexes = {}
+        self.distractor_indexes = {}
+        self.save_homographs = None
+        self.all_translations = store
+        self.all_indices = make_index_array(xrange(len(store)))
+        self.translations = self.all_indices
 
     def __len__(self):
         return len(self.translations)
 
     def __getitem__(self, index):
-        return self.translations[index]
+        return self.all_translations[self.translations[index]]
 
     def get_langs(self):
         return [lang for lang in self.header if lang != self.GROUP_KEY]
 
     def get_groups(self):
-        return {translation[self.GROUP_KEY] for translation in self.translations}
+        if self.translations is self.all_indices:
+            return set(self.store.group_names)
+        return {group for (_, group) in self.store.iter_groups(self.translations)}
 
+    @stats.timed(u'apply_filter')
     def apply_filter(self, translations_filter):
-        self.translations = translations_filter.filter(self.translations)
+        indices = None if self.translations is self.all_indices else self.translations
+        selected = translations_filter.select_indices(self.all_translations, indices)
+        if selected is not None:
+            self.translations = selected
         return self
 
     def clear_filter(self):
-        self.translations = self.all_translations[:]
+        self.translations = self.all_indices
+
+    def extended(self, rows):
+        '''Returns a new dictionary with rows (in header order) appended, this one stays unchanged.'''
+        rows = list(rows)
+        store = self.store.extended(rows)
+        alternatives = {}
+        for (lang, table) in self.alternatives.iteritems():
+            column = self.header.index(lang)
+            alternatives[lang] = table.extended([row[column] for row in rows], self.ALTERNATIVES_SEPARATOR)
+        return WordsDict.from_store(store, alternatives)
+
+    def view(self):
+        '''Returns a dictionary sharing all the data with this one, but with its own filter.'''
+        words_dict = WordsDict.__new__(WordsDict)
+        words_dict.__dict__.update(self.__dict__)
+        return words_dict
+
+    def get_position(self, dict_entry):
+        index = getattr(dict_entry, u'index', None)
+        if index is None or getattr(dict_entry, u'store', None) is not self.store:
+            return None
+        position = bisect_left(self.translations, index)
+        if position < len(self.translations) and self.translations[position] == index:
+            return position
+        return None
+
+    def get_alternatives(self, dict_entry, lang):
+        lang_alternatives = self.alternatives.get(lang)
+        if lang_alternatives is not None and getattr(dict_entry, u'store', None) is self.store:
+            return lang_alternatives[dict_entry.index]
+        return self.split_alternatives(dict_entry[lang])
+
+    def split_alternatives(self, value):
+        return split_alternatives(value, self.ALTERNATIVES_SEPARATOR)
+
+    def get_prefix_index(self, lang):
+        '''Index of alternatives of the language over all the rows, built on the first search.'''
+        prefix_index = self.prefix_indexes.get(lang)
+        if prefix_index is None:
+            if lang not in self.get_langs():
+                raise ValueError(u'WordsDict - unknown language %s' % (lang,))
+            table = self.alternatives.get(lang)
+            if isinstance(table, AlternativesTable):
+                prefix_index = PrefixIndex.from_table(table)
+            else:
+                prefix_index = PrefixIndex.from_alternatives(self.get_alternatives(dict_entry, lang)
+                                                             for dict_entry in self.store)
+            self.prefix_indexes[lang] = prefix_index
+        return prefix_index
+
+    def get_homographs(self, lang):
+        '''Returns {lowercased text: rows} of texts of the language shared by more than one row.
+
+        Compiled dictionaries get them from the cache, databases look every text up by a query, others
+        find them on the first call - lazy dictionaries then add them to the cache (save_homographs).
+        '''
+        homographs = self.homographs_indexes.get(lang)
+        if homographs is None:
+            if hasattr(self.store, u'get_homographs'):
+                homographs = self.store.get_homographs(lang)
+            else:
+                homographs = find_homographs(self.store.iter_values(lang))
+            self.homographs_indexes[lang] = homographs
+            if self.save_homographs is not None:
+                self.save_homographs(self.homographs_indexes)
+        return homographs
+
+    def compile_homographs(self, ask_langs=None):
+        ask_langs = self.get_langs() if ask_langs is None else ask_langs
+        return {lang: self.get_homographs(lang) for lang in ask_langs}
+
+    def get_distractor_index(self, lang):
+        distractor_index = self.distractor_indexes.get(lang)
+        if distractor_index is None:
+            distractor_index = DistractorIndex(self.store, lang, self.ALTERNATIVES_SEPARATOR)
+            self.distractor_indexes[lang] = distractor_index
+        return distractor_index
+
+    def lookup(self, word, langs=None):
+        '''Returns entries (regardless of the filter) having the word as one of alternatives in any of langs.'''
+        key = word.lower().strip()
+        rows = set()
+        for lang in self.get_langs() if langs is None else langs:
+            rows.update(self.get_prefix_index(lang).find(key))
+        return [self.store[row] for row in sorted(rows)]
+
+    def suggest(self, prefix, lang, limit=SUGGESTIONS_LIMIT):
+        '''Returns up to limit alternatives of the language starting with prefix, alphabetically.'''
+        return self.get_prefix_index(lang).suggest(prefix.lower().lstrip(), limit)
+
+    def compile(self, answer_langs=None, ask_langs=None):
+        answer_langs = self.get_langs() if answer_langs is None else answer_langs
+        alternatives = {lang: AlternativesTable(self.store.columns[lang], self.ALTERNATIVES_SEPARATOR)
+                        for lang in answer_langs}
+
+        return {
+            u'store': self.store,
+            u'alternatives': alternatives,
+            u'homographs': self.compile_homographs(ask_langs),
+        }
 
     def to_utf8(self, value):
-        try:
-            return value.decode('utf-8')
-        except UnicodeEncodeError:
-            return value
+        return to_utf8(value)
 
     @staticmethod
     def from_string_io(lines):
@@ -81,40 +216,236 @@ class WordsDict:
         words_dict = WordsDict(reader)
         return words_dict
 
+    @staticmethod
+    def from_store(store, alternatives=None, homographs=None):
+        words_dict = WordsDict.__new__(WordsDict)
+        words_dict.header = store.header
+        words_dict.set_store(store)
+        words_dict.alternatives = {} if alternatives is None else alternatives
+        if homographs is not None:
+            words_dict.homographs_indexes.update(homographs)
+        return words_dict
+
+    @staticmethod
+    def from_shards(stores, alternatives):
+        if len(stores) == 1:
+            return WordsDict.from_store(stores[0], alternatives[0])
+
+        store = ShardedStore(stores, WordsDict.GROUP_KEY)
+        sharded_alternatives = {}
+        for lang in store.header:
+            tables = [shard_alternatives.get(lang) for shard_alternatives in alternatives]
+            if any(table is not None for table in tables):
+                sharded_alternatives[lang] = ShardedAlternatives(store, lang, tables, WordsDict.ALTERNATIVES_SEPARATOR)
+        return WordsDict.from_store(store, sharded_alternatives)
+
+    @staticmethod
+    @stats.timed(u'load_shards')
+    def from_files(paths, langs=None, lazy=False, processes=None):
+        '''Loads every file as a shard, files are parsed in parallel by a pool of processes.'''
+        arguments = [(path, langs, lazy) for path in paths]
+        if len(paths) > 1 and processes != 1:
+            pool = multiprocessing.Pool(processes)
+            try:
+                loaded = pool.map(load_shard, arguments)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            loaded = map(load_shard, arguments)
+
+        if not loaded:
+            raise ValueError(u'WordsDict - no files')
+        stores, alternatives = zip(*loaded)
+        return WordsDict.from_shards(list(stores), list(alternatives))
+
+    @staticmethod
+    def from_path(path, langs=None, lazy=False, processes=None):
+        if not os.path.isdir(path):
+            return WordsDict.from_file(path, langs, lazy)
+
+        return WordsDict.from_files(list_dictionary_files(path), langs, lazy, processes)
+
+    @staticmethod
+    def from_compiled(compiled):
+        return WordsDict.from_store(compiled[u'store'], compiled.get(u'alternatives'), compiled.get(u'homographs'))
+
+    @staticmethod
+    @stats.timed(u'load')
+    def from_file(path, langs=None, lazy=False):
+        if path.endswith(SQLITE_SUFFIX):
+            store = SqliteStore(path, WordsDict.GROUP_KEY)
+            if langs:
+                select_columns(store.header, WordsDict.GROUP_KEY, langs)
+            return WordsDict.from_store(store)
+
+        ask_langs = langs[:1] if langs else None
+        if lazy:
+            # Homographs of every language would take a parse of the whole file each - they are found
+            # on the first use of the language and saved to the cache then
+            source = dict_cache.get_source_info(path)
+            compiled = dict_cache.load(path, langs, LazyCsvStore.CACHE_KIND)
+            if compiled is None:
+                compiled = {
+                    u'store': LazyCsvStore(path, WordsDict.GROUP_KEY, langs),
+                    u'homographs': {},
+                }
+                dict_cache.save(path, compiled, langs, LazyCsvStore.CACHE_KIND)
+            words_dict = WordsDict.from_compiled(compiled)
+
+            def save_homographs(homographs):
+                if dict_cache.get_source_info(path) == source:
+                    dict_cache.save(path, {u'store': words_dict.store, u'homographs': homographs}, langs,
+                                    LazyCsvStore.CACHE_KIND)
+            words_dict.save_homographs = save_homographs
+            return words_dict
+
+        compiled = dict_cache.load(path, langs)
+        if compiled is not None:
+            return WordsDict.from_compiled(compiled)
+
+        with open(path, u'rb') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=';')
+            words_dict = WordsDict(csv_reader, langs)
+
+        answer_langs = langs[1:] if langs else None
+        compiled = words_dict.compile(answer_langs, ask_langs)
+        words_dict.alternatives = compiled[u'alternatives']
+        dict_cache.save(path, compiled, langs)
+        return words_dict
+
+
+def load_shard(arguments):
+    path, langs, lazy = arguments
+    words_dict = WordsDict.from_file(path, langs, lazy)
+    return words_dict.store, words_dict.alternatives
+
 
 class WordsTestEngine:
-    def __init__(self, words_dict, ask_lang, ans_lang, avoid_repeat=True):
+    def __init__(self, words_dict, ask_lang, ans_lang, avoid_repeat=True, matcher=None, seed=None,
+                 randomizer_factory=None):
         if ask_lang == ans_lang:
             raise ValueError(u'Answer language cannot be the same as answer language (%s)' % ask_lang)
         self.words_dict = words_dict
         self.ask_lang = ask_lang
         self.ans_lang = ans_lang
-
-        if avoid_repeat:
-            self.randomizer = AvoidRepeatRandomizer(0, len(self.words_dict) - 1)
-        else:
-            self.randomizer = SimpleRandomizer(0, len(self.words_dict) - 1)
+        self.matcher = AnswerMatcher() if matcher is None else matcher
+        self.answers_cache = {}
+        self.questions_index = None
+        self.homographs = None
+        self.random = random.Random(seed)
+
+        if randomizer_factory is None:
+            randomizer_factory = AvoidRepeatRandomizer if avoid_repeat else SimpleRandomizer
+        self.randomizer = randomizer_factory(0, len(self.words_dict) - 1, seed)
+        bind = getattr(self.randomizer, u'bind', None)
+        if bind is not None:
+            bind(self.get_entry_key)
 
     def reset(self):
         self.randomizer.reset()
 
+    def save_state(self):
+        save = getattr(self.randomizer, u'save', None)
+        if save is not None:
+            save()
+
+    def set_error_rates(self, error_rates):
+        '''Passes past error rates ({row index: rate}) of entries to the randomizer if it uses them.'''
+        set_error_rates = getattr(self.randomizer, u'set_error_rates', None)
+        if set_error_rates is not None:
+            translations = self.words_dict.translations
+            set_error_rates({position: error_rates[index] for (position, index) in enumerate(translations)
+                             if index in error_rates})
+
+    def get_entry_key(self, index):
+        dict_entry = self.words_dict[index]
+        return u'%s;%s' % (dict_entry[self.ask_lang], dict_entry[self.ans_lang])
+
+    def record_answer(self, dict_entry, correct):
+        record = getattr(self.randomizer, u'record', None)
+        if record is not None:
+            index = self.words_dict.get_position(dict_entry)
+            if index is not None:
+                record(index, correct)
+
     def get_dict_entry(self, index=None):
-        index = self.randomizer.next_random() if index is None else index
+        index = self.draw() if index is None else index
         return self.words_dict[index]
 
+    @stats.timed(u'draw')
+    def draw(self):
+        return self.randomizer.next_random()
+
+    def find_entry(self, question):
+        if self.questions_index is None:
+            self.questions_index = {}
+            for (index, dict_entry) in enumerate(self.words_dict):
+                self.questions_index.setdefault(dict_entry[self.ask_lang].lower(), index)
+        return self.questions_index.get(question.lower())
+
+    def get_answers(self, dict_entry):
+        index = getattr(dict_entry, u'index', None)
+        key = (dict_entry[self.ask_lang], dict_entry[self.ans_lang]) if index is None else index
+        answers = self.answers_cache.get(key)
+        if answers is None:
+            stats.count(u'answers_cache_misses')
+            expected_answers = self.words_dict.get_alternatives(dict_entry, self.ans_lang)
+            sibling_rows = self.get_homographs().get(dict_entry[self.ask_lang].lower().strip())
+            if sibling_rows:
+                expected_answers = self.add_sibling_answers(expected_answers, index, sibling_rows)
+            accepted_answers = frozenset(self.matcher.normalize(expected_answer, self.ans_lang)
+                                         for expected_answer in expected_answers)
+            answers = self.answers_cache[key] = (expected_answers, accepted_answers)
+        return answers
+
+    def get_homographs(self):
+        if self.homographs is None:
+            self.homographs = self.words_dict.get_homographs(self.ask_lang)
+        return self.homographs
+
+    def add_sibling_answers(self, expected_answers, index, sibling_rows):
+        '''Answers of rows asking the same question are correct too - listed after those of the row itself.'''
+        all_answers = list(expected_answers)
+        for row in sibling_rows:
+            if row == index:
+                continue
+            sibling_entry = self.words_dict.store[row]
+            for answer in self.words_dict.get_alternatives(sibling_entry, self.ans_lang):
+                if answer and answer not in all_answers:
+                    all_answers.append(answer)
+        return tuple(all_answers)
+
+    def get_choices(self, dict_entry, count):
+        '''Returns count options in random order - the first answer of the entry and wrong ones like it.'''
+        distractor_index = self.words_dict.get_distractor_index(self.ans_lang)
+        correct_option = distractor_index.get_option(dict_entry[self.ans_lang])
+        accepted_answers = self.get_answers(dict_entry)[1]
+
+        def is_correct(option):
+            return self.matcher.matches(self.matcher.normalize(option, self.ans_lang), accepted_answers)
+
+        options = distractor_index.select(dict_entry[WordsDict.GROUP_KEY], correct_option, count - 1, is_correct,
+                                          self.random)
+        options.append(correct_option)
+        self.random.shuffle(options)
+        return options
+
     def get_expected_answers(self, dict_entry):
-        expected_answers_list = dict_entry[self.ans_lang]
-        expected_answers = expected_answers_list.split(u'|')
-        lowered_expected_answers = map(lambda s: s.lower(), expected_answers)
-        return lowered_expected_answers
+        expected_answers = self.get_answers(dict_entry)[0]
+        return list(expected_answers)
 
+    @stats.timed(u'get_error')
     def get_error(self, dict_entry, answer):
-        lowered_answer = answer.lower()
-        expected_answers = self.get_expected_answers(dict_entry)
-        if lowered_answer not in expected_answers:
+        normalized_answer = self.matcher.normalize(answer, self.ans_lang)
+        expected_answers, accepted_answers = self.get_answers(dict_entry)
+        correct = self.matcher.matches(normalized_answer, accepted_answers)
+        self.record_answer(dict_entry, correct)
+        stats.count(u'answers')
+        if not correct:
             question = dict_entry[self.ask_lang]
             return {
-                u'expected': expected_answers,
+                u'expected': list(expected_answers),
                 u'answer': answer,
                 u'question': question,
             }
@@ -123,45 +454,61 @@ class WordsTestEngine:
 
 
 class WordsTest:
-    def __init__(self, words_dict, tests_num, ask_lang, ans_lang, quick_feedback=True):
-        self.tests_engine = WordsTestEngine(words_dict, ask_lang, ans_lang)
-        self.tests_num = min(tests_num, len(words_dict))
-        self.init_status(False)
+    def __init__(self, words_dict, tests_num, ask_lang, ans_lang, quick_feedback=True, matcher=None,
+                 randomizer_factory=None, results_log=None, test_input=None, test_output=None, seed=None,
+                 choices=0):
+        self.tests_engine = WordsTestEngine(words_dict, ask_lang, ans_lang, matcher=matcher, seed=seed,
+                                            randomizer_factory=randomizer_factory)
+        self.session = TestSession(self.tests_engine, tests_num, results_log)
+        self.tests_num = self.session.tests_num
         self.quick_feedback = quick_feedback
+        self.choices = choices
+        self.options = []
+        self.input = TerminalInput() if test_input is None else test_input
+        self.output = ConsoleOutput() if test_output is None else test_output
 
     def test(self, use_cache):
-        self.init_status(not use_cache)
-        for test_num in range(self.tests_num):
-            dict_entry = self.get_dict_entry(test_num, use_cache)
+        self.session.start(use_cache)
+        dict_entry = self.session.next_question()
+        while dict_entry is not None:
             self.ask_question(dict_entry)
+            asked_time = time.time()
             answer = self.read_answer(dict_entry)
-            self.update_status(dict_entry, answer)
+            latency = time.time() - asked_time
+            stats.add_time(u'response', latency)
+            error = self.session.submit_answer(answer, latency)
+            self.record_answer(dict_entry, answer, error, latency)
+            if self.quick_feedback:
+                self.present_quick_feedback(error)
+            dict_entry = self.session.next_question()
 
         self.present_results()
 
-    def get_dict_entry(self, test_num, use_cache=False):
-        if use_cache:
-            return self.cache[test_num]
-        else:
-            dict_entry = self.tests_engine.get_dict_entry()
-            self.cache.append(dict_entry)
-            return dict_entry
-
     def ask_question(self, dict_entry):
         question = self.make_question(dict_entry)
-        print_info(question)
+        self.output.info(question)
+        if self.choices:
+            self.options = self.tests_engine.get_choices(dict_entry, self.choices)
+            for (option_num, option) in enumerate(self.options, 1):
+                self.output.write(u'%d) %s' % (option_num, option))
 
     def read_answer(self, dict_entry):
-        answer = raw_input('%s: ' % self.tests_engine.ans_lang).decode(u'utf-8')
+        self.output.flush()
+        answer = self.input.read(u'%s: ' % to_utf8(self.tests_engine.ans_lang))
+        if self.choices and answer.strip().isdigit() and 1 <= int(answer) <= len(self.options):
+            return self.options[int(answer) - 1]
         return answer
 
-    def update_status(self, dict_entry, answer):
-        error = self.tests_engine.get_error(dict_entry, answer)
-        if error:
-            self.wrong_answers.append(error)
-
-        if self.quick_feedback:
-            self.present_quick_feedback(error)
+    def record_answer(self, dict_entry, answer, error, latency):
+        self.output.record({
+            u'type': u'answer',
+            u'index': getattr(dict_entry, u'index', None),
+            u'question': dict_entry[self.tests_engine.ask_lang],
+            u'answer': answer,
+            u'correct': error is None,
+            u'expected': error[u'expected'] if error else [],
+            u'latency': round(latency, 3),
+        })
 
     def present_quick_feedback(self, error):
         if error:
@@ -170,20 +517,28 @@ class WordsTest:
             msg_or = _(u' or ')
             expected_options = msg_or.join(expected)
             msg_error = _(u'Error: %(ans)s -> %(exp)s') % {u'ans': answer, u'exp': expected_options}
-            print_error(msg_error)
+            self.output.error(msg_error)
         else:
-            print_ok(u'OK')
+            self.output.ok(u'OK')
 
     def present_results(self):
-        errors_count = len(self.wrong_answers)
+        wrong_answers = self.session.summary()[u'errors']
+        errors_count = len(wrong_answers)
+        self.output.record({
+            u'type': u'summary',
+            u'ask_lang': to_utf8(self.tests_engine.ask_lang),
+            u'ans_lang': to_utf8(self.tests_engine.ans_lang),
+            u'questions': self.tests_num,
+            u'errors': errors_count,
+        })
         if errors_count == 0:
-            print_ok(_(u'Perfect! No errors!!!'))
+            self.output.ok(_(u'Perfect! No errors!!!'))
         else:
-            print_error(_(u'Unfortunately, there were errors'))
+            self.output.error(_(u'Unfortunately, there were errors'))
             msg_summary = (_(u'Number of errors is %(errors)d for %(questions)d questions.') %
                            {u'errors': errors_count, u'questions': self.tests_num})
-            print_error(msg_summary)
-            for (error_num, wrong_answer) in enumerate(self.wrong_answers, 1):
+            self.output.error(msg_summary)
+            for (error_num, wrong_answer) in enumerate(wrong_answers, 1):
                 expected = wrong_answer[u'expected']
                 expected_options = _(u' or ').join(expected)
                 answer = wrong_answer[u'answer']
@@ -192,33 +547,143 @@ class WordsTest:
                 explanation_msg = (_(u'%(num)d. In question "%(question)s": "%(ans)s" -> "%(expected)s"') %
                                    {u'num': error_num, u'question': question,
                                     u'ans': answer, u'expected': expected_options})
-                print_error(explanation_msg)
+                self.output.error(explanation_msg)
+        self.output.flush()
 
     def make_question(self, dict_entry):
         question = (_(u'Translate into %(ans)s: "%(ask)s"') %
                     {u'ans': self.tests_engine.ans_lang, u'ask': dict_entry[self.tests_engine.ask_lang]})
         return question
 
-    def init_status(self, clear_cache):
-        self.tests_engine.reset()
-        self.wrong_answers = []
-        if clear_cache:
-            self.cache = []
+
+RANDOMIZERS = {
+    u'simple': SimpleRandomizer,
+    u'avoid': AvoidRepeatRandomizer,
+    u'spaced': functools.partial(SpacedRepetitionRandomizer, path=SPACED_STATE_FILE),
+    u'weighted': WeightedRandomizer,
+}
+OUTPUT_FORMATS = [u'text', u'json']
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description=u'Asks for translations of words drawn from the dictionary. '
+                                                 u'Parameters which are not given are asked for.')
+    parser.add_argument(u'--dict', nargs=u'+', default=[DICT_FILE],
+                        help=u'dictionary files or directories of shard files (default: %(default)s)')
+    parser.add_argument(u'--lazy', action=u'store_true', help=u'read rows from the file only when needed')
+    parser.add_argument(u'-n', u'--questions', type=int, help=u'number of questions')
+    parser.add_argument(u'--ask', help=u'questions language')
+    parser.add_argument(u'--ans', help=u'answers language')
+    parser.add_argument(u'--groups', nargs=u'+', type=to_utf8, help=u'examined groups (default: asked for)')
+    parser.add_argument(u'--all-groups', action=u'store_true', help=u'examine all groups')
+    parser.add_argument(u'--recent', type=int, help=u'examine only given number of the most recent words')
+    parser.add_argument(u'--seed', type=int, help=u'seed of the questions order, for reproducible runs')
+    parser.add_argument(u'--randomizer', choices=sorted(RANDOMIZERS), default=u'avoid',
+                        help=u'how questions are drawn (default: %(default)s)')
+    parser.add_argument(u'--output', choices=OUTPUT_FORMATS, default=u'text',
+                        help=u'text, or JSON lines with results on standard output (default: %(default)s)')
+    parser.add_argument(u'--choices', type=int, default=0,
+                        help=u'number of options of multiple choice questions (default: type answers)')
+    parser.add_argument(u'--once', action=u'store_true', help=u'do not ask whether to repeat the test')
+    parser.add_argument(u'--fold-accents', action=u'store_true', help=u'accept answers without diacritics')
+    parser.add_argument(u'--strip-articles', action=u'store_true', help=u'accept answers without articles')
+    parser.add_argument(u'--max-distance', type=int, default=0,
+                        help=u'accept answers with up to that many typos (default: %(default)s)')
+    parser.add_argument(u'--results-log', default=RESULTS_LOG_FILE, help=u'log of answers (default: %(default)s)')
+    stats.add_arguments(parser)
+    return parser
+
+
+def load_words_dict(paths, lazy=False):
+    if len(paths) == 1:
+        return WordsDict.from_path(paths[0], lazy=lazy)
+    return WordsDict.from_files(paths, lazy=lazy)
+
+
+def list_dictionary_files(path):
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(os.path.join(path, file_name) for file_name in os.listdir(path)
+                  if file_name.endswith((u'.csv', SQLITE_SUFFIX)))
+
+
+def get_dictionary_id(paths):
+    '''Hashes the content of the dictionary files - logged row ids are valid only for the very same rows.'''
+    dict_hash = hashlib.md5()
+    for path in paths:
+        for file_path in list_dictionary_files(path):
+            dict_hash.update(dict_cache.get_file_hash(file_path))
+    return dict_hash.hexdigest()
+
+
+def check_arguments(parser, args, words_dict):
+    langs = words_dict.get_langs()
+    for lang in (args.ask, args.ans):
+        if lang is not None and lang not in langs:
+            parser.error(u'unknown language %s, choose from: %s' % (lang, u', '.join(langs)))
+    if args.ask is not None and args.ask == args.ans:
+        parser.error(u'questions and answers languages must differ')
+    if args.groups:
+        unknown_groups = set(args.groups) - words_dict.get_groups()
+        if unknown_groups:
+            parser.error(u'unknown groups: %s' % (u', '.join(sorted(unknown_groups)),))
+    for (name, value) in ((u'questions', args.questions), (u'recent', args.recent)):
+        if value is not None and value < 1:
+            parser.error(u'--%s must be positive' % (name,))
+    if args.max_distance < 0:
+        parser.error(u'--max-distance must be nonnegative')
+    if args.choices == 1 or args.choices < 0:
+        parser.error(u'--choices must be at least 2')
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    stats.enable_from_args(args)
+
+    words_dict = load_words_dict(args.dict, args.lazy)
+    check_arguments(parser, args, words_dict)
+    matcher = AnswerMatcher(args.fold_accents, args.strip_articles, args.max_distance)
+    given_groups = words_dict.get_groups() if args.all_groups else args.groups and set(args.groups)
+    if args.output == u'json':
+        test_input = TerminalInput(sys.stderr)
+        test_output = JsonLinesOutput()
+    else:
+        test_input = TerminalInput()
+        test_output = ConsoleOutput()
+    set_io(test_input, test_output)
+    dictionary_id = get_dictionary_id(args.dict)
+    results_log = ResultsLog(args.results_log, dictionary_id)
+
+    parameters = (args.questions, args.ask, args.ans, given_groups, args.recent)
+    try:
+        repeat_mode = RepeatMode.REPEAT_NEW_PARAMS
+        while repeat_mode != RepeatMode.NO_REPEAT:
+            if repeat_mode == RepeatMode.REPEAT_NEW_PARAMS:
+                words_dict.clear_filter()
+                tests_num, ask_lang, ans_lang, chosen_groups, count = get_test_parameters(words_dict, *parameters)
+                # Command line parameters are for the first test only, different ones are asked for later
+                parameters = ()
+                words_dict.apply_filter(LangsFilter((ask_lang, ans_lang)).link(
+                    GroupFilter(chosen_groups).link(CountFilter(count))))
+                words_test = WordsTest(words_dict, tests_num, ask_lang, ans_lang, matcher=matcher,
+                                       randomizer_factory=RANDOMIZERS[args.randomizer], seed=args.seed,
+                                       choices=args.choices,
+                                       results_log=results_log, test_input=test_input, test_output=test_output)
+                if args.randomizer == u'weighted':
+                    results_log.flush()
+                    words_test.tests_engine.set_error_rates(
+                        load_error_rates(args.results_log, to_utf8(ask_lang), to_utf8(ans_lang), dictionary_id))
+
+            repeat_previous_test = repeat_mode == RepeatMode.REPEAT_QUESTIONS
+            words_test.test(repeat_previous_test)
+            if args.once:
+                break
+            repeat_mode = choose_repeat_mode()
+    finally:
+        test_output.flush()
+        results_log.close()
 
 
 if __name__ == u'__main__':
-    with open(DICT_FILE, u'rb') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=';')
-        words_dict = WordsDict(csv_reader)
-
-    repeat_mode = RepeatMode.REPEAT_NEW_PARAMS
-    while repeat_mode != RepeatMode.NO_REPEAT:
-        if repeat_mode == RepeatMode.REPEAT_NEW_PARAMS:
-            words_dict.clear_filter()
-            tests_num, ask_lang, ans_lang, chosen_groups, count = get_test_parameters(words_dict)
-            words_dict.apply_filter(GroupFilter(chosen_groups).link(CountFilter(count)))
-            words_test = WordsTest(words_dict, tests_num, ask_lang, ans_lang)
-
-        repeat_previous_test = repeat_mode == RepeatMode.REPEAT_QUESTIONS
-        words_test.test(repeat_previous_test)
-        repeat_mode = choose_repeat_mode()
+    main()
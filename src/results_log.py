@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import struct
+import time
+from collections import Counter, defaultdict
+from itertools import compress
+
+from storage import to_utf8
+
+
+# row id, language pair id, correct flag, answer latency in milliseconds, timestamp
+RECORD = struct.Struct('<IHBId')
+FIELDS_COUNT = 5
+PAIRS_SUFFIX = u'.pairs'
+PAIRS_DELIMITER = u';'
+READ_RECORDS = 1 << 16
+
+
+class ResultsLog(object):
+    '''Append-only binary log of answers, written in batches of fixed-size records.
+
+    Language pairs are numbered in a small text file next to the log, one "ask;ans;dictionary" line each.
+    Row ids are positions in the dictionary, so they are kept apart for every dictionary (its content id).
+    '''
+
+    BUFFER_RECORDS = 512
+
+    def __init__(self, path, dictionary=u''):
+        self.path = path
+        self.dictionary = dictionary
+        self.pairs = load_pairs(path)
+        self.pair_ids = {pair: pair_id for (pair_id, pair) in enumerate(self.pairs)}
+        self.buffer = []
+
+    def append(self, row_id, ask_lang, ans_lang, correct, latency, timestamp=None):
+        pair_id = self.get_pair_id((to_utf8(ask_lang), to_utf8(ans_lang), self.dictionary))
+        timestamp = time.time() if timestamp is None else timestamp
+        self.buffer.append(RECORD.pack(row_id, pair_id, int(bool(correct)), int(latency * 1000), timestamp))
+        if len(self.buffer) >= self.BUFFER_RECORDS:
+            self.flush()
+
+    def get_pair_id(self, pair):
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is None:
+            with open(self.path + PAIRS_SUFFIX, u'ab') as pairs_file:
+                pairs_file.write(PAIRS_DELIMITER.join(pair).encode('utf-8') + '\n')
+            pair_id = self.pair_ids[pair] = len(self.pairs)
+            self.pairs.append(pair)
+        return pair_id
+
+    def flush(self):
+        if self.buffer:
+            with open(self.path, u'ab') as log_file:
+                log_file.write(''.join(self.buffer))
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_pairs(path):
+    '''Returns (ask_lang, ans_lang, dictionary) of every pair id, logs of older versions have no dictionary.'''
+    try:
+        with open(path + PAIRS_SUFFIX, u'rb') as pairs_file:
+            pairs = [line.decode('utf-8').rstrip(u'\n').split(PAIRS_DELIMITER) for line in pairs_file]
+    except IOError:
+        return []
+    return [tuple(pair + [u''] * (3 - len(pair))) for pair in pairs]
+
+
+def read_records(path):
+    '''Yields chunks of records as columns - row ids, pair ids, correct flags, latencies, timestamps.'''
+    chunk_size = READ_RECORDS * RECORD.size
+    chunk_format = '<' + RECORD.format.lstrip('<') * READ_RECORDS
+    try:
+        log_file = open(path, u'rb')
+    except IOError:
+        return
+
+    with log_file:
+        while True:
+            chunk = log_file.read(chunk_size)
+            if not chunk:
+                break
+            records_count = len(chunk) // RECORD.size
+            if records_count != READ_RECORDS:
+                # Last chunk, a partially written record at the end is skipped
+                chunk = chunk[:records_count * RECORD.size]
+                chunk_format = '<' + RECORD.format.lstrip('<') * records_count
+            values = struct.unpack(chunk_format, chunk)
+            yield tuple(values[field::FIELDS_COUNT] for field in range(FIELDS_COUNT))
+
+
+def load_statistics(path, dictionary=u''):
+    '''Returns {(ask_lang, ans_lang): {row_id: (answers_count, errors_count)}} of the dictionary over the whole log.'''
+    answers = Counter()
+    errors = Counter()
+    for (row_ids, pair_ids, correct_flags, _, _) in read_records(path):
+        keys = zip(pair_ids, row_ids)
+        answers.update(keys)
+        errors.update(compress(keys, (not correct for correct in correct_flags)))
+
+    pairs = load_pairs(path)
+    statistics = defaultdict(dict)
+    for ((pair_id, row_id), answers_count) in answers.iteritems():
+        ask_lang, ans_lang, pair_dictionary = pairs[pair_id]
+        if pair_dictionary == dictionary:
+            statistics[(ask_lang, ans_lang)][row_id] = (answers_count, errors[(pair_id, row_id)])
+    return dict(statistics)
+
+
+def load_error_rates(path, ask_lang, ans_lang, dictionary=u''):
+    pair_statistics = load_statistics(path, dictionary).get((ask_lang, ans_lang), {})
+    return {row_id: float(errors_count) / answers_count
+            for (row_id, (answers_count, errors_count)) in pair_statistics.iteritems()}
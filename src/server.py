@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import asynchat
+import asyncore
+import os
+import socket
+
+from filters import GroupFilter, LangsFilter
+from i18n import N_, Translator
+import stats
+from repeat_pl_br import DICT_FILE, WordsDict, WordsTestEngine
+from session import TestSession
+from storage import to_utf8
+from watcher import DictWatcher
+
+
+DEFAULT_HOST = u'localhost'
+DEFAULT_PORT = 8765
+MAX_LINE_LENGTH = 4096
+
+
+class QuizSession(object):
+    '''State of a single learner - own engine and filter, dictionary data shared with all the sessions.
+
+    Protocol is line based, every command gets one or more response lines:
+      LANGS                              -> LANGS <lang> ...
+      GROUPS                             -> GROUPS <group>|...
+      START <ask> <ans> [<n> [<groups>]] -> QUESTION <text>   (groups separated with "|")
+      ANSWER <text>                      -> OK or ERROR <expected>|..., then QUESTION <text> or DONE <errors> <questions>
+      LANGUAGE <code>                    -> LANGUAGE <code>   (language of FAIL messages, e.g. pl)
+      QUIT                               -> BYE
+    Wrong commands are answered with FAIL <message>.
+    '''
+
+    def __init__(self, words_dict):
+        self.words_dict = words_dict
+        self.test_session = None
+        self.finished = False
+        self.translate = Translator()
+
+    def handle_line(self, line):
+        command, _, argument = line.strip().partition(u' ')
+        handler = getattr(self, u'command_' + command.lower(), None)
+        if handler is None:
+            return [u'FAIL ' + self.translate(N_(u'unknown command %s')) % (command,)]
+        try:
+            return handler(argument.strip())
+        except ValueError as error:
+            return [u'FAIL ' + self.translate(unicode(error))]
+
+    def command_langs(self, argument):
+        return [u' '.join([u'LANGS'] + [to_utf8(lang) for lang in self.words_dict.get_langs()])]
+
+    def command_groups(self, argument):
+        return [u'GROUPS ' + u'|'.join(sorted(self.words_dict.get_groups()))]
+
+    def command_start(self, argument):
+        arguments = argument.split(None, 3)
+        if len(arguments) < 2:
+            raise ValueError(N_(u'START needs question and answer languages'))
+        langs = self.get_langs()
+        if arguments[0] not in langs or arguments[1] not in langs:
+            raise ValueError(N_(u'unknown language'))
+        ask_lang, ans_lang = langs[arguments[0]], langs[arguments[1]]
+
+        session_dict = self.words_dict.view()
+        sessions_filter = LangsFilter((ask_lang, ans_lang))
+        if len(arguments) > 3:
+            sessions_filter.link(GroupFilter(set(arguments[3].split(u'|'))))
+        session_dict.apply_filter(sessions_filter)
+        if len(session_dict) == 0:
+            raise ValueError(N_(u'no questions'))
+        tests_num = int(arguments[2]) if len(arguments) > 2 else len(session_dict)
+        if tests_num < 1:
+            raise ValueError(N_(u'number of questions must be positive'))
+
+        self.test_session = TestSession(WordsTestEngine(session_dict, ask_lang, ans_lang), tests_num)
+        return [self.next_question()]
+
+    def command_answer(self, answer):
+        if self.test_session is None or self.test_session.is_finished():
+            raise ValueError(N_(u'no question asked'))
+
+        error = self.test_session.submit_answer(answer)
+        if error:
+            responses = [u'ERROR ' + u'|'.join(error[u'expected'])]
+        else:
+            responses = [u'OK']
+        responses.append(self.next_question())
+        return responses
+
+    def command_language(self, argument):
+        if not argument:
+            raise ValueError(N_(u'LANGUAGE needs a language code'))
+        self.translate = Translator(argument)
+        return [u'LANGUAGE ' + argument]
+
+    def command_quit(self, argument):
+        self.finished = True
+        return [u'BYE']
+
+    def get_langs(self):
+        return {to_utf8(lang): lang for lang in self.words_dict.get_langs()}
+
+    def next_question(self):
+        dict_entry = self.test_session.next_question()
+        if dict_entry is None:
+            summary = self.test_session.summary()
+            return u'DONE %d %d' % (len(summary[u'errors']), summary[u'questions'])
+        return u'QUESTION ' + dict_entry[self.test_session.tests_engine.ask_lang]
+
+
+class QuizChannel(asynchat.async_chat):
+    def __init__(self, sock, words_dict, socket_map):
+        asynchat.async_chat.__init__(self, sock, map=socket_map)
+        self.set_terminator('\n')
+        self.buffer = []
+        self.buffer_length = 0
+        self.session = QuizSession(words_dict)
+
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+        self.buffer_length += len(data)
+        if self.buffer_length > MAX_LINE_LENGTH:
+            self.push_lines([u'FAIL line too long'])
+            self.close_when_done()
+
+    def found_terminator(self):
+        line = ''.join(self.buffer)
+        self.buffer = []
+        self.buffer_length = 0
+        try:
+            unicode_line = line.decode('utf-8')
+        except UnicodeDecodeError:
+            self.push_lines([u'FAIL line is not UTF-8'])
+            return
+
+        self.push_lines(self.session.handle_line(unicode_line))
+        if self.session.finished:
+            self.close_when_done()
+
+    def push_lines(self, lines):
+        self.push(''.join(line.encode('utf-8') + '\n' for line in lines))
+
+
+class QuizServer(asyncore.dispatcher):
+    '''Single threaded, non-blocking server - every connection is a separate quiz session.
+
+    Sockets are polled rather than selected, select() cannot watch descriptors above 1024.
+    '''
+
+    def __init__(self, words_dict, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_map=None, watcher=None):
+        self.socket_map = {} if socket_map is None else socket_map
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
+        self.words_dict = words_dict
+        self.watcher = watcher
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(socket.SOMAXCONN)
+
+    def get_port(self):
+        return self.socket.getsockname()[1]
+
+    def handle_accept(self):
+        connection = self.accept()
+        if connection is not None:
+            # Session works on the snapshot current at connection time, even if the file is reloaded later
+            QuizChannel(connection[0], self.get_words_dict(), self.socket_map)
+
+    def get_words_dict(self):
+        return self.words_dict if self.watcher is None else self.watcher.words_dict
+
+    def serve(self, timeout=30.0, count=None):
+        if self.watcher is None:
+            asyncore.loop(timeout, use_poll=True, map=self.socket_map, count=count)
+            return
+
+        while self.socket_map and (count is None or count > 0):
+            asyncore.loop(min(timeout, self.watcher.check_interval), use_poll=True, map=self.socket_map, count=1)
+            self.watcher.check_if_due()
+            if count is not None:
+                count -= 1
+
+    def close_all(self):
+        asyncore.close_all(self.socket_map)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=u'Serves quizzes to many learners over a line based TCP protocol.')
+    parser.add_argument(u'--dict', default=DICT_FILE,
+                        help=u'dictionary file or directory of shard files (default: %(default)s)')
+    parser.add_argument(u'--host', default=DEFAULT_HOST, help=u'address to listen on (default: %(default)s)')
+    parser.add_argument(u'--port', type=int, default=DEFAULT_PORT, help=u'port to listen on (default: %(default)s)')
+    parser.add_argument(u'--watch', action=u'store_true', help=u'reload the dictionary when the file changes')
+    stats.add_arguments(parser)
+    args = parser.parse_args(argv)
+    stats.enable_from_args(args)
+    if args.watch and os.path.isdir(args.dict):
+        parser.error(u'--watch needs a single dictionary file, not a directory of shards')
+
+    if args.watch:
+        watcher = DictWatcher(args.dict)
+        server = QuizServer(watcher.words_dict, args.host, args.port, watcher=watcher)
+    else:
+        server = QuizServer(WordsDict.from_path(args.dict), args.host, args.port)
+    try:
+        server.serve()
+    finally:
+        server.close_all()
+
+
+if __name__ == u'__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+class TestSession(object):
+    '''Test driven step by step - next_question, submit_answer and summary - with no input or output.
+
+    Frontends (terminal, scripted batches, the server) decide how questions are shown and answers read.
+    '''
+
+    def __init__(self, tests_engine, tests_num, results_log=None):
+        self.tests_engine = tests_engine
+        self.tests_num = min(tests_num, len(tests_engine.words_dict))
+        self.results_log = results_log
+        self.cache = []
+        self.start()
+
+    def start(self, use_cache=False):
+        self.tests_engine.reset()
+        self.use_cache = use_cache
+        if not use_cache:
+            self.cache = []
+        self.wrong_answers = []
+        self.asked = 0
+        self.dict_entry = None
+        self.finished = False
+
+    def next_question(self):
+        if self.dict_entry is not None:
+            return self.dict_entry
+        if self.asked >= self.tests_num:
+            self.finish()
+            return None
+
+        if self.use_cache:
+            self.dict_entry = self.cache[self.asked]
+        else:
+            self.dict_entry = self.tests_engine.get_dict_entry()
+            self.cache.append(self.dict_entry)
+        self.asked += 1
+        return self.dict_entry
+
+    def submit_answer(self, answer, latency=0):
+        if self.dict_entry is None:
+            raise ValueError(u'There is no question to answer')
+
+        dict_entry = self.dict_entry
+        self.dict_entry = None
+        error = self.tests_engine.get_error(dict_entry, answer)
+        if error:
+            self.wrong_answers.append(error)
+
+        row_id = getattr(dict_entry, u'index', None)
+        if self.results_log is not None and row_id is not None:
+            self.results_log.append(row_id, self.tests_engine.ask_lang, self.tests_engine.ans_lang,
+                                    error is None, latency)
+        return error
+
+    def is_finished(self):
+        return self.dict_entry is None and self.asked >= self.tests_num
+
+    def finish(self):
+        if not self.finished:
+            self.finished = True
+            self.tests_engine.save_state()
+            if self.results_log is not None:
+                self.results_log.flush()
+
+    def summary(self):
+        return {
+            u'questions': self.tests_num,
+            u'errors': list(self.wrong_answers),
+        }
+
+
+class TerminalInput(object):
+    '''Reads answers typed by the user, prompts go to the stream if given (default: standard output).'''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def read(self, prompt):
+        encoded_prompt = prompt.encode('utf-8') if isinstance(prompt, unicode) else prompt
+        if self.stream is not None:
+            self.stream.write(encoded_prompt)
+            self.stream.flush()
+            encoded_prompt = ''
+        return raw_input(encoded_prompt).decode('utf-8')
+
+
+class ScriptedInput(object):
+    '''Reads prepared answers, runs out with EOFError like the terminal does.'''
+
+    def __init__(self, answers):
+        self.answers = iter(answers)
+
+    def read(self, prompt):
+        try:
+            return next(self.answers)
+        except StopIteration:
+            raise EOFError()
+
+
+class RecordingOutput(object):
+    '''Keeps everything written as (kind, text) pairs instead of printing it.'''
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text):
+        self.lines.append((u'text', text))
+
+    def info(self, text):
+        self.lines.append((u'info', text))
+
+    def ok(self, text):
+        self.lines.append((u'ok', text))
+
+    def warning(self, text):
+        self.lines.append((u'warning', text))
+
+    def error(self, text):
+        self.lines.append((u'error', text))
+
+    def record(self, data):
+        self.lines.append((u'record', data))
+
+    def flush(self):
+        pass
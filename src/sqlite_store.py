@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import csv
+import os
+import sqlite3
+from itertools import islice
+
+from storage import BaseStore, RowsCache, check_header, find_homographs, make_index_array, select_columns, to_utf8
+
+
+SQLITE_SUFFIX = u'.sqlite'
+GROUP_KEY = u'group'
+# Rows looked up by a single query - below the SQLite limit of query parameters
+QUERY_CHUNK_SIZE = 500
+
+
+def quote(identifier):
+    return u'"%s"' % (to_utf8(identifier).replace(u'"', u'""'),)
+
+
+def iter_chunks(values, size):
+    values = iter(values)
+    chunk = list(islice(values, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(values, size))
+
+
+class SqliteHomographs(object):
+    '''Rows of homographs of one language ({lowercased text: rows} like dict.get), read by an indexed query.'''
+
+    def __init__(self, store, field):
+        self.store = store
+        self.field = field
+
+    def get(self, key, default=None):
+        query = u'SELECT row FROM homographs WHERE field = ? AND key = ? ORDER BY row'
+        rows = tuple(row for (row,) in self.store.connection.execute(query, (self.field, key)))
+        return rows if rows else default
+
+
+class SqliteStore(BaseStore):
+    '''Translations kept in an SQLite database, rows are read when they are accessed.
+
+    Row numbers are the insertion order (the table primary key) and there is an index on groups,
+    so filters of groups and recent rows run as indexed queries (query_rows) instead of scans.
+    Homographs are found during the import and looked up by an index as well.
+    '''
+
+    CACHE_SIZE = 1024
+
+    def __init__(self, path, group_key=GROUP_KEY):
+        if not os.path.exists(path):
+            raise ValueError(u'WordsDict - no database %s' % (path,))
+        self.path = path
+        self.open()
+        tables = {name for (name,) in self.connection.execute(u"SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {u'header', u'translations', u'homographs'} <= tables:
+            raise ValueError(u'WordsDict - database %s has to be imported again' % (path,))
+        header = [field.encode('utf-8') for (field,) in
+                  self.connection.execute(u'SELECT field FROM header ORDER BY position')]
+        check_header(header, group_key)
+        super(SqliteStore, self).__init__(header, group_key, None)
+        self.size = self.connection.execute(u'SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def open(self):
+        self.connection = sqlite3.connect(self.path)
+        self.rows_cache = RowsCache(self.CACHE_SIZE)
+
+    def close(self):
+        self.connection.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in (u'connection', u'rows_cache'):
+            del state[attribute]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def group_names(self):
+        query = u'SELECT %s FROM translations GROUP BY %s ORDER BY MIN(row)' % (quote(self.group_key),
+                                                                               quote(self.group_key))
+        return [group for (group,) in self.connection.execute(query)]
+
+    def get_row(self, index):
+        row = self.rows_cache.get(index)
+        if row is None:
+            columns = u', '.join(quote(field) for field in self.header)
+            values = self.connection.execute(u'SELECT %s FROM translations WHERE row = ?' % (columns,),
+                                             (index,)).fetchone()
+            if values is None:
+                raise IndexError(u'SqliteStore index out of range')
+            row = dict(zip(self.header, values))
+            self.rows_cache.put(index, row)
+        return row
+
+    def get_value(self, index, field):
+        if field not in self.header:
+            raise KeyError(field)
+        return self.get_row(index)[field]
+
+    def get_group(self, index):
+        return self.get_value(index, self.group_key)
+
+    def iter_values(self, field):
+        if field not in self.header:
+            raise KeyError(field)
+        cursor = self.connection.execute(u'SELECT %s FROM translations ORDER BY row' % (quote(field),))
+        return (value for (value,) in cursor)
+
+    def iter_groups(self, indices):
+        columns = u'row, %s' % (quote(self.group_key),)
+        for chunk in iter_chunks(indices, QUERY_CHUNK_SIZE):
+            query = u'SELECT %s FROM translations WHERE row IN (%s)' % (columns, u', '.join([u'?'] * len(chunk)))
+            groups = dict(self.connection.execute(query, chunk))
+            for index in chunk:
+                yield index, groups[index]
+
+    def get_homographs(self, field):
+        if field not in self.header or field == self.group_key:
+            raise KeyError(field)
+        return SqliteHomographs(self, field)
+
+    def get_group_rows(self, group):
+        query = u'SELECT row FROM translations WHERE %s = ? ORDER BY row' % (quote(self.group_key),)
+        return make_index_array(row for (row,) in self.connection.execute(query, (group,)))
+
+    def query_rows(self, groups=None, limit=None, min_row=None):
+        '''Yields numbers of rows of given groups, from the most recent one backwards.'''
+        conditions = []
+        parameters = []
+        if groups is not None:
+            groups = list(groups)
+            if not groups:
+                return iter(())
+            conditions.append(u'%s IN (%s)' % (quote(self.group_key), u', '.join([u'?'] * len(groups))))
+            parameters.extend(groups)
+        if min_row is not None:
+            conditions.append(u'row >= ?')
+            parameters.append(min_row)
+        query = u'SELECT row FROM translations'
+        if conditions:
+            query += u' WHERE ' + u' AND '.join(conditions)
+        query += u' ORDER BY row DESC'
+        if limit is not None:
+            query += u' LIMIT ?'
+            parameters.append(limit)
+        return (row for (row,) in self.connection.execute(query, parameters))
+
+
+def import_homographs(connection, fields):
+    connection.execute(u'CREATE TABLE homographs (field TEXT NOT NULL, key TEXT NOT NULL, row INTEGER NOT NULL)')
+    for field in fields:
+        if field == GROUP_KEY:
+            continue
+        cursor = connection.execute(u'SELECT %s FROM translations ORDER BY row' % (quote(field),))
+        homographs = find_homographs(value for (value,) in cursor)
+        connection.executemany(u'INSERT INTO homographs VALUES (?, ?, ?)',
+                               ((to_utf8(field), key, row) for (key, rows) in homographs.iteritems() for row in rows))
+    connection.execute(u'CREATE INDEX homographs_key ON homographs (field, key)')
+
+
+def import_csv(csv_path, db_path, langs=None, delimiter=';'):
+    '''Creates the database (replacing an existing one) with rows of the CSV file, returns their number.'''
+    with open(csv_path, u'rb') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+        try:
+            header = next(csv_reader)
+        except StopIteration:
+            raise ValueError(u'WordsDict - empty file')
+        check_header(header, GROUP_KEY)
+        columns = select_columns(header, GROUP_KEY, langs)
+        fields = [header[column] for column in columns]
+
+        def read_rows():
+            for (row, line) in enumerate(csv_reader):
+                if len(header) != len(line):
+                    raise ValueError(u'WordsDict - wrong fields (%s) number in line %d.' % (line, csv_reader.line_num))
+                yield [row] + [to_utf8(line[column]) for column in columns]
+
+        tmp_path = db_path + u'.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        connection = sqlite3.connect(tmp_path)
+        try:
+            with connection:
+                connection.execute(u'CREATE TABLE header (position INTEGER PRIMARY KEY, field TEXT NOT NULL)')
+                connection.executemany(u'INSERT INTO header VALUES (?, ?)',
+                                       [(position, to_utf8(field)) for (position, field) in enumerate(fields)])
+                connection.execute(u'CREATE TABLE translations (row INTEGER PRIMARY KEY, %s)' %
+                                   (u', '.join(u'%s TEXT NOT NULL' % (quote(field),) for field in fields),))
+                placeholders = u', '.join([u'?'] * (len(fields) + 1))
+                connection.executemany(u'INSERT INTO translations VALUES (%s)' % (placeholders,), read_rows())
+                # Created after the import - one sort instead of updating the index on every insert
+                connection.execute(u'CREATE INDEX translations_group ON translations (%s, row)' % (quote(GROUP_KEY),))
+                import_homographs(connection, fields)
+            rows_count = connection.execute(u'SELECT COUNT(*) FROM translations').fetchone()[0]
+        except Exception:
+            connection.close()
+            os.remove(tmp_path)
+            raise
+        connection.close()
+
+    os.rename(tmp_path, db_path)
+    return rows_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=u'Imports a dictionary file into an SQLite database.')
+    parser.add_argument(u'dict', help=u'dictionary file')
+    parser.add_argument(u'database', nargs=u'?', help=u'database file (default: dictionary file with %s suffix)' %
+                                                      (SQLITE_SUFFIX,))
+    parser.add_argument(u'--langs', nargs=u'+', help=u'import only given languages')
+    args = parser.parse_args(argv)
+
+    db_path = args.database or os.path.splitext(args.dict)[0] + SQLITE_SUFFIX
+    rows_count = import_csv(args.dict, db_path, args.langs)
+    print u'%d rows imported into %s' % (rows_count, db_path)
+
+
+if __name__ == u'__main__':
+    main()
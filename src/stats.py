@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+
+# BOMDIA_STATS=1 prints the summary at exit, any other value is also a path of the stats file
+ENV_VARIABLE = 'BOMDIA_STATS'
+
+enabled = False
+stats_path = None
+timings = {}
+counters = {}
+
+
+class Timing(object):
+    __slots__ = ('calls', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        return {u'calls': self.calls, u'total': self.total, u'min': self.min, u'max': self.max}
+
+
+def enable(path=None, report=True):
+    '''Starts collecting timings and counters, with report they are shown (and saved to path) at exit.'''
+    global enabled, stats_path
+    if report and not enabled:
+        atexit.register(report_at_exit)
+    enabled = True
+    stats_path = path
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    timings.clear()
+    counters.clear()
+
+
+def add_time(name, seconds):
+    if enabled:
+        timing = timings.get(name)
+        if timing is None:
+            timing = timings[name] = Timing()
+        timing.add(seconds)
+
+
+def count(name, value=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + value
+
+
+def timed(name):
+    '''Decorator measuring every call of the function, a single flag check when stats are off.'''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add_time(name, time.time() - start)
+        return wrapper
+    return decorator
+
+
+def get_summary():
+    return {
+        u'timings': {name: timing.to_dict() for (name, timing) in timings.iteritems()},
+        u'counters': dict(counters),
+    }
+
+
+def format_summary():
+    lines = [u'%-20s %10s %12s %12s %12s' % (u'timing', u'calls', u'total s', u'mean ms', u'max ms')]
+    for (name, timing) in sorted(timings.iteritems()):
+        lines.append(u'%-20s %10d %12.3f %12.3f %12.3f' % (name, timing.calls, timing.total,
+                                                           timing.total / timing.calls * 1000, timing.max * 1000))
+    for (name, value) in sorted(counters.iteritems()):
+        lines.append(u'%-20s %10d' % (name, value))
+    return lines
+
+
+def dump(path):
+    with open(path, u'wb') as stats_file:
+        json.dump(get_summary(), stats_file, indent=2, sort_keys=True)
+
+
+def report_at_exit():
+    if not enabled or not (timings or counters):
+        return
+    sys.stderr.write(u'\n'.join(format_summary()).encode('utf-8') + '\n')
+    if stats_path:
+        dump(stats_path)
+
+
+def add_arguments(parser):
+    parser.add_argument(u'--stats', nargs=u'?', const=u'', metavar=u'FILE',
+                        help=u'show timings at exit, save them to the file if given (or set %s)' % (ENV_VARIABLE,))
+
+
+def enable_from_args(args):
+    if args.stats is not None:
+        enable(args.stats or None)
+
+
+def enable_from_environment():
+    value = os.environ.get(ENV_VARIABLE)
+    if value:
+        enable(None if value == '1' else value)
+
+
+enable_from_environment()
@@ -0,0 +1,684 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import copy
+import cStringIO
+import csv
+import mmap
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Mapping, OrderedDict, Sequence
+from itertools import chain, islice, izip, repeat
+
+
+INDEX_TYPECODE = 'l'
+
+
+class IndexArray(array):
+    '''Array of row indices pickled as raw bytes rather than as a list of ints.'''
+
+    def __reduce__(self):
+        return (load_index_array, (self.tostring(),))
+
+
+def make_index_array(values=()):
+    return IndexArray(INDEX_TYPECODE, values)
+
+
+def load_index_array(data):
+    indices = make_index_array()
+    indices.fromstring(data)
+    return indices
+
+
+def join_index_arrays(*index_arrays):
+    joined = make_index_array()
+    for indices in index_arrays:
+        joined.extend(indices)
+    return joined
+
+
+EMPTY_INDEX = make_index_array()
+
+
+def to_utf8(value):
+    try:
+        return value.decode('utf-8')
+    except UnicodeEncodeError:
+        return value
+
+
+def split_alternatives(value, separator):
+    return tuple(alternative.lower() for alternative in value.split(separator))
+
+
+def find_homographs(values):
+    '''Returns {lowercased text: rows} of texts shared by more than one of values.'''
+    first_rows = {}
+    homographs = {}
+    for (index, value) in enumerate(values):
+        key = value.lower().strip()
+        if not key:
+            continue
+        first_row = first_rows.setdefault(key, index)
+        if first_row != index:
+            homographs.setdefault(key, [first_row]).append(index)
+    return {key: tuple(rows) for (key, rows) in homographs.iteritems()}
+
+
+def ends_quoted(record, delimiter=';', quote='"'):
+    '''Tells whether the record text ends inside a quoted field.
+
+    Like csv, only a quote at the start of a field opens it - in 'tela 5" tv' the quote is a plain character.
+    '''
+    quoted = False
+    field_start = True
+    position = 0
+    while position < len(record):
+        char = record[position]
+        if quoted:
+            if char == quote:
+                if record[position + 1:position + 2] == quote:
+                    position += 1
+                else:
+                    quoted = False
+        elif char == quote and field_start:
+            quoted = True
+        field_start = char == delimiter and not quoted
+        position += 1
+    return quoted
+
+
+def check_header(header, group_key):
+    if group_key not in header:
+        raise ValueError(u'WordsDict - incorrect header - missing %s field' % (group_key,))
+
+
+def select_columns(header, group_key, langs=None):
+    if langs is None:
+        return range(len(header))
+
+    for lang in langs:
+        if lang not in header or lang == group_key:
+            raise ValueError(u'WordsDict - unknown language %s' % (lang,))
+    return [column for (column, field) in enumerate(header) if field in langs or field == group_key]
+
+
+class StringTable(Sequence):
+    '''Column of strings kept as one text blob and an array of offsets.'''
+
+    def __init__(self, values=()):
+        self.offsets = make_index_array([0])
+        parts = []
+        position = 0
+        for value in values:
+            parts.append(value)
+            position += len(value)
+            self.offsets.append(position)
+        self.text = u''.join(parts)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(u'StringTable index out of range')
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        text = self.text
+        return (text[start:end] for (start, end) in izip(self.offsets, islice(self.offsets, 1, None)))
+
+    @staticmethod
+    def joined(tables):
+        table = StringTable()
+        position = 0
+        for part in tables:
+            table.offsets.extend(offset + position for offset in part.offsets[1:])
+            position += len(part.text)
+        table.text = u''.join(part.text for part in tables)
+        return table
+
+    def extended(self, values):
+        added = StringTable(values)
+        table = copy.copy(self)
+        table.text = self.text + added.text
+        table.offsets = join_index_arrays(self.offsets, (offset + len(self.text) for offset in added.offsets[1:]))
+        return table
+
+
+class AlternativesTable(Sequence):
+    '''Lowercased alternatives of every row of a string table, split on the separator in advance.'''
+
+    def __init__(self, column, separator):
+        self.text = column.text.lower()
+        offsets = column.offsets
+        if len(self.text) != len(column.text):
+            lowered = [value.lower() for value in column]
+            self.text = u''.join(lowered)
+            offsets = StringTable(lowered).offsets
+
+        self.starts = make_index_array()
+        self.ends = make_index_array()
+        self.row_starts = make_index_array([0])
+        find = self.text.find
+        for row in xrange(len(column)):
+            position = offsets[row]
+            end = offsets[row + 1]
+            separator_position = find(separator, position, end)
+            while separator_position != -1:
+                self.starts.append(position)
+                self.ends.append(separator_position)
+                position = separator_position + len(separator)
+                separator_position = find(separator, position, end)
+            self.starts.append(position)
+            self.ends.append(end)
+            self.row_starts.append(len(self.starts))
+
+    def __len__(self):
+        return len(self.row_starts) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(u'AlternativesTable index out of range')
+        return tuple(self.text[self.starts[alternative]:self.ends[alternative]]
+                     for alternative in xrange(self.row_starts[index], self.row_starts[index + 1]))
+
+    def extended(self, values, separator):
+        added = AlternativesTable(StringTable(values), separator)
+        table = copy.copy(self)
+        table.text = self.text + added.text
+        table.starts = join_index_arrays(self.starts, (start + len(self.text) for start in added.starts))
+        table.ends = join_index_arrays(self.ends, (end + len(self.text) for end in added.ends))
+        table.row_starts = join_index_arrays(self.row_starts, (row_start + len(self.starts)
+                                                               for row_start in added.row_starts[1:]))
+        return table
+
+
+class PrefixIndex(object):
+    '''Alternatives of one language sorted together with their rows - exact and prefix search by bisection.'''
+
+    def __init__(self, keys, rows):
+        order = sorted(xrange(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[position] for position in order]
+        self.rows = make_index_array(rows[position] for position in order)
+
+    @staticmethod
+    def from_alternatives(rows_alternatives):
+        keys = []
+        rows = make_index_array()
+        for (row, alternatives) in enumerate(rows_alternatives):
+            for alternative in alternatives:
+                keys.append(alternative.strip())
+                rows.append(row)
+        return PrefixIndex(keys, rows)
+
+    @staticmethod
+    def from_table(table):
+        '''Built straight from offsets of an alternatives table, without splitting rows into tuples.'''
+        text = table.text
+        keys = [text[start:end].strip() for (start, end) in izip(table.starts, table.ends)]
+        rows = make_index_array()
+        for row in xrange(len(table)):
+            rows.extend(repeat(row, table.row_starts[row + 1] - table.row_starts[row]))
+        return PrefixIndex(keys, rows)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, key):
+        if not key:
+            return []
+        start = bisect_left(self.keys, key)
+        end = bisect_right(self.keys, key, start)
+        return sorted(set(self.rows[start:end]))
+
+    def iter_prefix(self, prefix):
+        '''Yields (alternative, row) pairs of alternatives starting with prefix, in alphabetical order.'''
+        keys = self.keys
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and keys[position].startswith(prefix):
+            yield keys[position], self.rows[position]
+            position += 1
+
+    def suggest(self, prefix, limit):
+        suggestions = []
+        for (key, _) in self.iter_prefix(prefix):
+            if len(suggestions) >= limit:
+                break
+            if key and (not suggestions or suggestions[-1] != key):
+                suggestions.append(key)
+        return suggestions
+
+
+class RowsCache(object):
+    '''Parsed rows of the most recently used indices, the least recently used one is dropped when full.'''
+
+    def __init__(self, size):
+        self.size = size
+        self.rows = OrderedDict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, index):
+        row = self.rows.pop(index, None)
+        if row is not None:
+            self.rows[index] = row
+        return row
+
+    def put(self, index, row):
+        if len(self.rows) >= self.size:
+            self.rows.popitem(last=False)
+        self.rows[index] = row
+
+
+class TranslationRow(object):
+    '''Read-only view of a single row, indexed by header fields like a dict.
+
+    Mapping methods are written out instead of inherited - collections.Mapping has no __slots__,
+    so a subclass would still get a __dict__ for every row.
+    '''
+
+    __slots__ = ('store', 'index')
+    __hash__ = None
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, field):
+        return self.store.get_value(self.index, field)
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field):
+        return field in self.store.header
+
+    def __iter__(self):
+        return iter(self.store.header)
+
+    def __len__(self):
+        return len(self.store.header)
+
+    def keys(self):
+        return list(self.store.header)
+
+    def values(self):
+        return [self[field] for field in self.store.header]
+
+    def items(self):
+        return [(field, self[field]) for field in self.store.header]
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+Mapping.register(TranslationRow)
+
+
+class GroupColumn(object):
+    '''Group of every row as an interned id, together with the group -> rows index.'''
+
+    def __init__(self):
+        self.ids = make_index_array()
+        self.names = []
+        self.name_ids = {}
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return self.names[self.ids[index]]
+
+    def append(self, group):
+        group_id = self.name_ids.get(group)
+        if group_id is None:
+            group_id = self.name_ids[group] = len(self.names)
+            self.names.append(group)
+            self.rows[group] = make_index_array()
+        self.rows[group].append(len(self.ids))
+        self.ids.append(group_id)
+
+    def get_rows(self, group):
+        return self.rows.get(group, EMPTY_INDEX)
+
+    def extended(self, groups):
+        '''Returns a copy with groups of new rows appended - rows indices of untouched groups are shared.'''
+        column = copy.copy(self)
+        column.ids = join_index_arrays(self.ids)
+        column.names = self.names[:]
+        column.name_ids = self.name_ids.copy()
+        column.rows = self.rows.copy()
+        copied_groups = set()
+        for group in groups:
+            if group in column.rows and group not in copied_groups:
+                column.rows[group] = join_index_arrays(column.rows[group])
+            copied_groups.add(group)
+            column.append(group)
+        return column
+
+
+class BaseStore(Sequence):
+    def __init__(self, header, group_key, groups):
+        self.header = header
+        self.group_key = group_key
+        self.groups = groups
+
+    @property
+    def group_names(self):
+        return self.groups.names
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(u'%s index out of range' % (type(self).__name__,))
+        return TranslationRow(self, index)
+
+    def get_value(self, index, field):
+        raise NotImplementedError()
+
+    def iter_values(self, field):
+        '''Yields values of the field of all rows in order - faster than get_value row by row.'''
+        for index in xrange(len(self)):
+            yield self.get_value(index, field)
+
+    def get_group(self, index):
+        return self.groups[index]
+
+    def iter_groups(self, indices):
+        '''Yields (index, group) pairs of given row indices, in their order.'''
+        for index in indices:
+            yield index, self.get_group(index)
+
+    def get_group_rows(self, group):
+        return self.groups.get_rows(group)
+
+
+class ColumnStore(BaseStore):
+    '''Translations kept column by column - one string table per language and interned group ids.'''
+
+    def __init__(self, header, group_key, columns, groups):
+        super(ColumnStore, self).__init__(header, group_key, groups)
+        self.columns = columns
+
+    def get_value(self, index, field):
+        if field == self.group_key:
+            return self.get_group(index)
+        try:
+            column = self.columns[field]
+        except KeyError:
+            raise KeyError(field)
+        return column[index]
+
+    def iter_values(self, field):
+        if field == self.group_key:
+            return iter(self.groups)
+        return iter(self.columns[field])
+
+    @staticmethod
+    def from_rows(header, group_key, rows):
+        group_column = header.index(group_key)
+        lang_columns = [(column, field) for (column, field) in enumerate(header) if field != group_key]
+        values = {field: [] for (_, field) in lang_columns}
+        groups = GroupColumn()
+
+        for row in rows:
+            for (column, field) in lang_columns:
+                values[field].append(row[column])
+            groups.append(row[group_column])
+
+        columns = {field: StringTable(field_values) for (field, field_values) in values.iteritems()}
+        return ColumnStore(header, group_key, columns, groups)
+
+    @staticmethod
+    def joined(header, group_key, stores):
+        '''Returns one store with rows of all given stores (of the same header), one after another.'''
+        columns = {field: StringTable.joined([store.columns[field] for store in stores])
+                   for field in header if field != group_key}
+        groups = GroupColumn()
+        for store in stores:
+            names = store.groups.names
+            for group_id in store.groups.ids:
+                groups.append(names[group_id])
+        return ColumnStore(header, group_key, columns, groups)
+
+    def extended(self, rows):
+        '''Returns a new store with given rows appended, this one stays unchanged.'''
+        rows = list(rows)
+        columns = {}
+        for (column, field) in enumerate(self.header):
+            if field != self.group_key:
+                columns[field] = self.columns[field].extended([row[column] for row in rows])
+        group_column = self.header.index(self.group_key)
+        groups = self.groups.extended([row[group_column] for row in rows])
+        return ColumnStore(self.header, self.group_key, columns, groups)
+
+
+class LazyCsvStore(BaseStore):
+    '''Memory-mapped CSV file of which only byte offsets and groups are read on open.
+
+    Rows are parsed when they are accessed, the most recently used ones are kept parsed (RowsCache).
+    '''
+
+    CACHE_SIZE = 1024
+    CACHE_KIND = u'lazy'
+    QUOTE = '"'
+
+    def __init__(self, path, group_key, langs=None, delimiter=';'):
+        self.path = path
+        self.delimiter = delimiter
+        self.open()
+
+        header = self.parse_line(self.data.readline())
+        check_header(header, group_key)
+        columns = select_columns(header, group_key, langs)
+        super(LazyCsvStore, self).__init__([header[column] for column in columns], group_key, GroupColumn())
+        self.positions = {header[column]: column for column in columns if header[column] != group_key}
+        self.offsets = make_index_array()
+        self.index_lines(header)
+
+    def open(self):
+        self.source = open(self.path, u'rb')
+        if os.fstat(self.source.fileno()).st_size == 0:
+            self.source.close()
+            raise ValueError(u'WordsDict - empty file')
+        self.data = mmap.mmap(self.source.fileno(), 0, access=mmap.ACCESS_READ)
+        self.rows_cache = RowsCache(self.CACHE_SIZE)
+
+    def index_lines(self, header):
+        group_column = header.index(self.group_key)
+        line_num = 1
+        while True:
+            offset = self.data.tell()
+            line = self.data.readline()
+            if not line:
+                break
+            line_num += 1
+            if self.QUOTE in line:
+                while ends_quoted(line, self.delimiter):
+                    continuation = self.data.readline()
+                    if not continuation:
+                        break
+                    line += continuation
+                    line_num += 1
+                try:
+                    fields = self.parse_line(line)
+                except ValueError:
+                    raise ValueError(u'WordsDict - not a single record in line %d.' % (line_num,))
+            else:
+                fields = line.rstrip('\r\n').split(self.delimiter)
+            if len(header) != len(fields):
+                raise ValueError(u'WordsDict - wrong fields (%s) number in line %d.' % (fields, line_num))
+
+            self.offsets.append(offset)
+            self.groups.append(to_utf8(fields[group_column]))
+        self.offsets.append(self.data.tell())
+
+    def parse_line(self, line):
+        '''Returns fields of the only record of line, raises ValueError if there are more.'''
+        records = list(csv.reader(cStringIO.StringIO(line), delimiter=self.delimiter))
+        if len(records) > 1:
+            raise ValueError(u'WordsDict - more than one record in %r' % (line,))
+        return records[0] if records else []
+
+    def get_row(self, index):
+        row = self.rows_cache.get(index)
+        if row is None:
+            fields = self.parse_line(self.data[self.offsets[index]:self.offsets[index + 1]])
+            row = {field: to_utf8(fields[column]) for (field, column) in self.positions.iteritems()}
+            self.rows_cache.put(index, row)
+        return row
+
+    def get_value(self, index, field):
+        if field == self.group_key:
+            return self.get_group(index)
+        return self.get_row(index)[field]
+
+    def iter_values(self, field):
+        if field == self.group_key:
+            return iter(self.groups)
+        column = self.positions[field]
+        return (to_utf8(fields[column]) for fields in csv.reader(self.iter_lines(), delimiter=self.delimiter))
+
+    def iter_lines(self):
+        '''Yields lines of all the rows straight from the mapped file.'''
+        data = self.data
+        position = self.offsets[0]
+        end = self.offsets[-1]
+        while position < end:
+            line_end = data.find('\n', position, end)
+            line_end = end if line_end == -1 else line_end + 1
+            yield data[position:line_end]
+            position = line_end
+
+    def close(self):
+        self.data.close()
+        self.source.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attribute in (u'source', u'data', u'rows_cache'):
+            del state[attribute]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+
+class ShardedStore(BaseStore):
+    '''Several stores presented as one - row indices of consecutive shards follow each other.
+
+    Shards may have different languages, the header is the union of them and a row from a shard
+    without some language has an empty value for it.
+    '''
+
+    def __init__(self, shards, group_key):
+        header = []
+        for shard in shards:
+            header.extend(field for field in shard.header if field not in header)
+        super(ShardedStore, self).__init__(header, group_key, None)
+        self.shards = shards
+        self.starts = make_index_array([0])
+        for shard in shards:
+            self.starts.append(self.starts[-1] + len(shard))
+        self.group_rows = {}
+
+    @property
+    def group_names(self):
+        names = []
+        known_names = set()
+        for shard in self.shards:
+            for name in shard.group_names:
+                if name not in known_names:
+                    known_names.add(name)
+                    names.append(name)
+        return names
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def locate(self, index):
+        shard_num = bisect_right(self.starts, index) - 1
+        return shard_num, index - self.starts[shard_num]
+
+    def get_value(self, index, field):
+        shard_num, shard_index = self.locate(index)
+        shard = self.shards[shard_num]
+        if field not in shard.header:
+            if field not in self.header:
+                raise KeyError(field)
+            return u''
+        return shard.get_value(shard_index, field)
+
+    def iter_values(self, field):
+        if field not in self.header:
+            raise KeyError(field)
+        return chain.from_iterable(shard.iter_values(field) if field in shard.header else repeat(u'', len(shard))
+                                   for shard in self.shards)
+
+    def get_group(self, index):
+        shard_num, shard_index = self.locate(index)
+        return self.shards[shard_num].get_group(shard_index)
+
+    def get_group_rows(self, group):
+        rows = self.group_rows.get(group)
+        if rows is None:
+            rows = self.group_rows[group] = make_index_array()
+            for (shard, start) in zip(self.shards, self.starts):
+                rows.extend(start + index for index in shard.get_group_rows(group))
+        return rows
+
+    def get_lang_ranges(self, langs):
+        '''Returns (start, end) index ranges of shards having all given languages.'''
+        return [(start, start + len(shard)) for (shard, start) in zip(self.shards, self.starts)
+                if all(lang in shard.header for lang in langs)]
+
+    def has_langs(self, index, langs):
+        shard = self.shards[self.locate(index)[0]]
+        return all(lang in shard.header for lang in langs)
+
+
+class ShardedAlternatives(Sequence):
+    '''Alternatives tables of all shards of a sharded store, split on demand for shards without a table.'''
+
+    def __init__(self, store, lang, tables, separator):
+        self.store = store
+        self.lang = lang
+        self.tables = tables
+        self.separator = separator
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        shard_num, shard_index = self.store.locate(index)
+        table = self.tables[shard_num]
+        if table is None:
+            return split_alternatives(self.store.get_value(index, self.lang), self.separator)
+        return table[shard_index]
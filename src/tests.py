@@ -2,9 +2,41 @@
 # -*- coding: utf-8 -*-
 
 
+import StringIO
+import gettext
+import json
+import os
+import re
+import resource
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
 import unittest
+from collections import Mapping
 
-from repeat_pl_br import (AvoidRepeatRandomizer, SimpleRandomizer, WordsDict, WordsTestEngine,
+import dict_cache
+from storage import AlternativesTable, ColumnStore, PrefixIndex, RowsCache, StringTable
+from benchmarks import compare, generate_dictionary
+from filters import LangsFilter, NoFilter
+from importer import import_dictionary, read_chunks
+from grading import RESULT_ERROR, RESULT_OK, RESULT_UNKNOWN, grade_answers, read_answers, write_results
+from utils import COLOR_ENDING, COLOR_OK, ConsoleOutput, JsonLinesOutput, get_fake_file
+from matching import AnswerMatcher, bounded_edit_distance, fold_diacritics
+from randomizer import FenwickTree, SpacedRepetitionRandomizer, WeightedRandomizer
+from server import QuizServer, QuizSession
+from sqlite_store import SqliteStore, import_csv
+from session import RecordingOutput, ScriptedInput, TestSession
+from watcher import DictWatcher
+import communication
+import grading
+import i18n
+import repeat_pl_br
+import server
+import stats
+from results_log import RECORD, ResultsLog, load_error_rates, load_pairs, load_statistics
+from repeat_pl_br import (AvoidRepeatRandomizer, SimpleRandomizer, WordsDict, WordsTest, WordsTestEngine,
                           CountFilter, GroupFilter)
 
 
@@ -74,6 +106,554 @@ class WordsDictTests(unittest.TestCase):
         self.assertEqual(self.reset_dict[1], self.expected_entries[1])
 
 
+class WordsDictCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+        self.write_dict([
+            'pl;br;en;group',
+            'cześć;Oi|olá;hi|hello;basics',
+            'dzień;o dia;day;basics2',
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_dict(self, lines):
+        with open(self.dict_path, 'wb') as dict_file:
+            dict_file.write('\n'.join(lines) + '\n')
+
+    def test_cache_created(self):
+        words_dict = WordsDict.from_file(self.dict_path)
+        self.assertTrue(os.path.exists(dict_cache.get_cache_path(self.dict_path)))
+        cached_dict = WordsDict.from_file(self.dict_path)
+        self.assertEqual(len(cached_dict), len(words_dict))
+        self.assertEqual(cached_dict[0], words_dict[0])
+        self.assertEqual(cached_dict.get_groups(), {u'basics', u'basics2'})
+        self.assertEqual(cached_dict.get_alternatives(cached_dict[0], u'br'), (u'oi', u'olá'))
+
+    def test_stale_cache(self):
+        WordsDict.from_file(self.dict_path)
+        self.write_dict([
+            'pl;br;en;group',
+            'dzień;o dia;day;basics2',
+        ])
+        os.utime(self.dict_path, (0, 0))
+        words_dict = WordsDict.from_file(self.dict_path)
+        self.assertEqual(len(words_dict), 1)
+        self.assertEqual(words_dict[0][u'pl'], u'dzień')
+
+    def test_pair_cache(self):
+        langs = (u'pl', u'br')
+        WordsDict.from_file(self.dict_path, langs)
+        self.assertIsNotNone(dict_cache.load(self.dict_path, langs))
+        words_dict = WordsDict.from_file(self.dict_path, langs)
+        self.assertEqual(words_dict.get_langs(), [u'pl', u'br'])
+        self.assertEqual(words_dict.get_alternatives(words_dict[0], u'br'), (u'oi', u'olá'))
+
+    def test_unknown_lang(self):
+        with self.assertRaises(ValueError):
+            WordsDict.from_file(self.dict_path, (u'pl', u'de'))
+
+
+class ColumnStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.header = [u'pl', u'br', u'group']
+        self.rows = [
+            [u'kobieta', u'a mulher', u'basics'],
+            [u'', u'o menino', u'basics2'],
+            [u'dziewczyna', u'a menina', u'basics'],
+        ]
+        self.store = ColumnStore.from_rows(self.header, u'group', self.rows)
+
+    def test_string_table(self):
+        table = StringTable([u'a', u'', u'ção'])
+        self.assertEqual(list(table), [u'a', u'', u'ção'])
+        self.assertEqual(table[-1], u'ção')
+        with self.assertRaises(IndexError):
+            table[3]
+
+    def test_interned_groups(self):
+        self.assertEqual(self.store.group_names, [u'basics', u'basics2'])
+        self.assertEqual(list(self.store.groups.ids), [0, 1, 0])
+        self.assertEqual(list(self.store.get_group_rows(u'basics')), [0, 2])
+
+    def test_row_view(self):
+        row = self.store[2]
+        self.assertEqual(row.index, 2)
+        self.assertEqual(row[u'pl'], u'dziewczyna')
+        self.assertEqual(row, dict(zip(self.header, self.rows[2])))
+        self.assertEqual(self.store[1][u'pl'], u'')
+        with self.assertRaises(KeyError):
+            row[u'en']
+        self.assertFalse(hasattr(row, u'__dict__'))
+        self.assertIsInstance(row, Mapping)
+        self.assertEqual(row.get(u'en', u'-'), u'-')
+        self.assertIn(u'br', row)
+        self.assertNotEqual(row, self.store[0])
+        self.assertEqual(dict(row), dict(zip(self.header, self.rows[2])))
+
+    def test_alternatives_table(self):
+        table = AlternativesTable(StringTable([u'Oi|olá', u'', u'o dia||Bom']), u'|')
+        self.assertEqual(list(table), [(u'oi', u'olá'), (u'', ), (u'o dia', u'', u'bom')])
+
+
+class LazyWordsDictTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_dict(self, lines, langs=None):
+        with open(self.dict_path, 'wb') as dict_file:
+            dict_file.write('\n'.join(lines) + '\n')
+        return WordsDict.from_file(self.dict_path, langs, lazy=True)
+
+    def test_rows(self):
+        words_dict = self.make_dict([
+            'pl;br;en;group',
+            'kobieta;a mulher;woman;basics',
+            'cześć;"oi;olá";"hi\nhello";basics2',
+            'chłopiec;o menino;boy;basics',
+        ])
+        self.assertEqual(len(words_dict), 3)
+        self.assertEqual(words_dict.get_groups(), {u'basics', u'basics2'})
+        self.assertEqual(words_dict[1], {u'pl': u'cześć', u'br': u'oi;olá', u'en': u'hi\nhello', u'group': u'basics2'})
+        self.assertEqual(words_dict[-1][u'pl'], u'chłopiec')
+        self.assertFalse(os.path.exists(dict_cache.get_cache_path(self.dict_path)))
+
+        cached_dict = WordsDict.from_file(self.dict_path, lazy=True)
+        self.assertEqual(list(cached_dict), list(words_dict))
+        self.assertEqual(list(cached_dict.store.iter_values(u'en')), [u'woman', u'hi\nhello', u'boy'])
+
+    def test_rows_cache(self):
+        rows_cache = RowsCache(2)
+        rows_cache.put(0, {u'pl': u'kobieta'})
+        rows_cache.put(1, {u'pl': u'dzień'})
+        self.assertEqual(rows_cache.get(0), {u'pl': u'kobieta'})
+        rows_cache.put(2, {u'pl': u'chłopiec'})
+        self.assertIsNone(rows_cache.get(1))
+        self.assertEqual(rows_cache.get(0), {u'pl': u'kobieta'})
+        self.assertEqual(len(rows_cache), 2)
+
+    def test_filters(self):
+        words_dict = self.make_dict([
+            'pl;br;en;group',
+            'kobieta;a mulher;woman;basics',
+            'dzień;o dia;day;basics2',
+            'chłopiec;o menino;boy;basics',
+        ], (u'pl', u'br'))
+        words_dict.apply_filter(GroupFilter({u'basics'}).link(CountFilter(1)))
+        self.assertEqual(list(words_dict), [{u'pl': u'chłopiec', u'br': u'o menino', u'group': u'basics'}])
+
+    def test_quote_inside_field(self):
+        lines = ['pl;br;group', 'ekran;tela 5" tv;g', 'kobieta;"a ""mulher""\nx";basics', 'dzień;o dia;basics2']
+        words_dict = self.make_dict(lines)
+        self.assertEqual(list(words_dict), list(WordsDict.from_string_io(lines)))
+        self.assertEqual(words_dict[0][u'br'], u'tela 5" tv')
+        self.assertEqual(words_dict[1][u'br'], u'a "mulher"\nx')
+        self.assertEqual(len(words_dict), 3)
+
+    def test_wrong_fields(self):
+        with self.assertRaises(ValueError):
+            self.make_dict(['pl;br;group', 'kobieta;a mulher;basics', 'dzień;basics2'])
+        words_dict = self.make_dict(['pl;br;group', 'kobieta;a mulher;basics'])
+        with self.assertRaises(ValueError):
+            words_dict.store.parse_line('dzień;o dia;basics2\nwoda;a água;food\n')
+
+    def test_empty_file(self):
+        with open(self.dict_path, 'wb'):
+            pass
+        with self.assertRaises(ValueError):
+            WordsDict.from_file(self.dict_path, lazy=True)
+
+
+class LookupTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'jabłko;a maçã;food',
+            'kobieta;a mulher|a esposa;basics',
+            'żona;a esposa;basics',
+            'mąka;a farinha;food',
+            'pusty;;food',
+        ])
+
+    def test_lookup(self):
+        self.assertEqual([entry[u'pl'] for entry in self.words_dict.lookup(u'A Maçã')], [u'jabłko'])
+        self.assertEqual([entry[u'pl'] for entry in self.words_dict.lookup(u'a esposa', [u'br'])],
+                         [u'kobieta', u'żona'])
+        self.assertEqual(self.words_dict.lookup(u'a esposa', [u'pl']), [])
+        self.assertEqual(self.words_dict.lookup(u''), [])
+
+    def test_lookup_ignores_filter(self):
+        self.words_dict.apply_filter(GroupFilter({u'food'}))
+        self.assertEqual([entry[u'pl'] for entry in self.words_dict.lookup(u'żona')], [u'żona'])
+
+    def test_suggest(self):
+        self.assertEqual(self.words_dict.suggest(u'a ', u'br'),
+                         [u'a esposa', u'a farinha', u'a maçã', u'a mulher'])
+        self.assertEqual(self.words_dict.suggest(u'A M', u'br', limit=1), [u'a maçã'])
+        self.assertEqual(self.words_dict.suggest(u'm', u'pl'), [u'mąka'])
+        self.assertEqual(self.words_dict.suggest(u'', u'pl', limit=2), [u'jabłko', u'kobieta'])
+        with self.assertRaises(ValueError):
+            self.words_dict.suggest(u'a', u'de')
+
+    def test_compiled_index(self):
+        compiled = self.words_dict.compile()
+        self.words_dict.alternatives = compiled[u'alternatives']
+        table_index = self.words_dict.get_prefix_index(u'br')
+        split_index = PrefixIndex.from_alternatives(self.words_dict.get_alternatives(entry, u'br')
+                                                    for entry in self.words_dict)
+        self.assertEqual(table_index.keys, split_index.keys)
+        self.assertEqual(list(table_index.rows), list(split_index.rows))
+
+
+class ShardedWordsDictTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write_shard('1.csv', [
+            'pl;br;group',
+            'kobieta;a mulher|a esposa;basics',
+            'jabłko;a maçã;food',
+        ])
+        self.write_shard('2.csv', [
+            'pl;en;group',
+            'dziewczyna;girl;basics',
+        ])
+        self.write_shard('3.csv', [
+            'pl;br;group',
+            'chłopiec;o menino;basics',
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_shard(self, file_name, lines):
+        with open(os.path.join(self.tmp_dir, file_name), 'wb') as dict_file:
+            dict_file.write('\n'.join(lines) + '\n')
+
+    def test_rows(self):
+        words_dict = WordsDict.from_path(self.tmp_dir, processes=1)
+        self.assertEqual(len(words_dict), 4)
+        self.assertEqual(words_dict.get_langs(), [u'pl', u'br', u'en'])
+        self.assertEqual(words_dict[1], {u'pl': u'jabłko', u'br': u'a maçã', u'en': u'', u'group': u'food'})
+        self.assertEqual(words_dict[2], {u'pl': u'dziewczyna', u'br': u'', u'en': u'girl', u'group': u'basics'})
+        self.assertEqual(words_dict.get_alternatives(words_dict[0], u'br'), (u'a mulher', u'a esposa'))
+
+    def test_parallel_load(self):
+        paths = [os.path.join(self.tmp_dir, file_name) for file_name in ('1.csv', '2.csv', '3.csv')]
+        words_dict = WordsDict.from_files(paths, processes=2)
+        self.assertEqual(list(words_dict), list(WordsDict.from_files(paths, processes=1)))
+        lazy_dict = WordsDict.from_files(paths, lazy=True, processes=2)
+        self.assertEqual(list(lazy_dict), list(words_dict))
+
+    def test_merged_groups(self):
+        words_dict = WordsDict.from_path(self.tmp_dir, processes=1)
+        self.assertEqual(words_dict.get_groups(), {u'basics', u'food'})
+        words_dict.apply_filter(GroupFilter({u'basics'}))
+        self.assertEqual(list(words_dict.translations), [0, 2, 3])
+        words_dict.apply_filter(CountFilter(2))
+        self.assertEqual([entry[u'pl'] for entry in words_dict], [u'dziewczyna', u'chłopiec'])
+
+    def test_langs_filter(self):
+        words_dict = WordsDict.from_path(self.tmp_dir, processes=1)
+        words_dict.apply_filter(LangsFilter((u'pl', u'br')).link(GroupFilter({u'basics'})))
+        self.assertEqual([entry[u'pl'] for entry in words_dict], [u'kobieta', u'chłopiec'])
+
+        os.remove(os.path.join(self.tmp_dir, '2.csv'))
+        words_dict = WordsDict.from_path(self.tmp_dir, processes=1)
+        words_dict.store.get_group = None
+        words_dict.apply_filter(LangsFilter((u'pl', u'br')).link(GroupFilter({u'basics'})))
+        self.assertEqual([entry[u'pl'] for entry in words_dict], [u'kobieta', u'chłopiec'])
+
+        single_dict = WordsDict.from_path(os.path.join(self.tmp_dir, '1.csv'))
+        single_dict.apply_filter(LangsFilter((u'pl', u'br')).link(CountFilter(1)))
+        self.assertEqual([entry[u'pl'] for entry in single_dict], [u'jabłko'])
+
+    def test_no_files(self):
+        with self.assertRaises(ValueError):
+            WordsDict.from_files([])
+
+
+class ImporterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_dict(self, lines):
+        with open(self.dict_path, 'wb') as dict_file:
+            dict_file.write('\n'.join(lines) + '\n')
+
+    def test_import(self):
+        self.write_dict([
+            'pl;br;en;group',
+            'kobieta;a mulher|a esposa;woman;basics',
+            'cześć;"oi;olá";"hi\nhello";basics2',
+            'chłopiec;o menino;boy;basics',
+            'woda;a água;water;food',
+        ])
+        words_dict, errors = import_dictionary(self.dict_path, processes=2, chunk_lines=2)
+        self.assertEqual(errors, [])
+        self.assertEqual(list(words_dict), list(WordsDict.from_string_io(open(self.dict_path, 'rb'))))
+        self.assertEqual(words_dict.get_groups(), {u'basics', u'basics2', u'food'})
+        self.assertEqual(list(words_dict.store.get_group_rows(u'basics')), [0, 2])
+        self.assertEqual(words_dict.get_alternatives(words_dict[0], u'br'), (u'a mulher', u'a esposa'))
+
+        self.assertIsNotNone(dict_cache.load(self.dict_path))
+        self.assertEqual(list(WordsDict.from_file(self.dict_path)), list(words_dict))
+
+    def test_all_errors(self):
+        self.write_dict([
+            'pl;br;group',
+            'kobieta;basics',
+            'chłopiec;o menino;basics',
+            '"dzień\n";o dia;food;',
+            'woda;a \xe1gua;food',
+            'jabłko;a maçã;food',
+        ])
+        words_dict, errors = import_dictionary(self.dict_path, processes=1, chunk_lines=2)
+        self.assertIsNone(words_dict)
+        self.assertEqual([line_num for (line_num, _) in errors], [2, 5, 6])
+        self.assertIsNone(dict_cache.load(self.dict_path))
+
+        _, parallel_errors = import_dictionary(self.dict_path, processes=2, chunk_lines=1)
+        self.assertEqual(parallel_errors, errors)
+
+    def test_chunks(self):
+        lines = ['a;b\n', '"c\n', 'd";e\n', 'f;g\n']
+        self.assertEqual(list(read_chunks(lines, 2)), [(2, 'a;b\n"c\nd";e\n'), (5, 'f;g\n')])
+        lines = ['a;5" b\n', 'c;d\n', '"e\n', 'f";g\n']
+        self.assertEqual(list(read_chunks(lines, 1)), [(2, 'a;5" b\n'), (3, 'c;d\n'), (4, '"e\nf";g\n')])
+
+
+class SqliteStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+        self.db_path = os.path.join(self.tmp_dir, 'translations.sqlite')
+        self.lines = [
+            'pl;br;group',
+            'kobieta;a mulher|a esposa;basics',
+            'jabłko;a maçã;food',
+            'dziewczyna;"a ""menina""";basics',
+            'woda;a água;food',
+            'chłopiec;o menino;basics2',
+        ]
+        with open(self.dict_path, 'wb') as dict_file:
+            dict_file.write('\n'.join(self.lines) + '\n')
+        self.assertEqual(import_csv(self.dict_path, self.db_path), 5)
+        self.words_dict = WordsDict.from_path(self.db_path)
+
+    def tearDown(self):
+        self.words_dict.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rows(self):
+        self.assertIsInstance(self.words_dict.store, SqliteStore)
+        self.assertEqual(list(self.words_dict), list(WordsDict.from_string_io(self.lines)))
+        self.assertEqual(self.words_dict.get_langs(), ['pl', 'br'])
+        self.assertEqual(self.words_dict.get_groups(), {u'basics', u'food', u'basics2'})
+        self.assertEqual(self.words_dict.store.group_names, [u'basics', u'food', u'basics2'])
+        self.assertEqual(self.words_dict.get_alternatives(self.words_dict[0], u'br'), (u'a mulher', u'a esposa'))
+        self.assertEqual(list(self.words_dict.store.iter_values(u'pl'))[-1], u'chłopiec')
+        with self.assertRaises(KeyError):
+            self.words_dict[0][u'en']
+
+    def test_filters(self):
+        memory_dict = WordsDict.from_string_io(self.lines)
+        for make_filter in (lambda: GroupFilter({u'basics', u'food'}).link(CountFilter(3)),
+                            lambda: CountFilter(3).link(GroupFilter({u'basics'})),
+                            lambda: GroupFilter({u'basics2'}),
+                            lambda: GroupFilter(set()),
+                            lambda: CountFilter(2)):
+            self.words_dict.clear_filter()
+            memory_dict.clear_filter()
+            self.words_dict.apply_filter(make_filter())
+            memory_dict.apply_filter(make_filter())
+            self.assertEqual(list(self.words_dict.translations), list(memory_dict.translations))
+
+    def test_query_rows(self):
+        store = self.words_dict.store
+        self.assertEqual(list(store.query_rows()), [4, 3, 2, 1, 0])
+        self.assertEqual(list(store.query_rows(groups=[u'basics'], limit=1)), [2])
+        self.assertEqual(list(store.query_rows(groups=[u'basics', u'food'], min_row=2)), [3, 2])
+        self.assertEqual(list(store.get_group_rows(u'food')), [1, 3])
+
+    def test_quiz(self):
+        tests_engine = WordsTestEngine(self.words_dict, u'pl', u'br', seed=0)
+        self.assertIsNone(tests_engine.get_error(self.words_dict[2], u'a "menina"'))
+        self.assertEqual([entry[u'pl'] for entry in self.words_dict.lookup(u'a esposa')], [u'kobieta'])
+
+    def test_filters_without_row_queries(self):
+        self.words_dict.store.get_row = None
+        self.words_dict.apply_filter(LangsFilter((u'pl', u'br')).link(
+            GroupFilter({u'basics', u'food'}).link(CountFilter(3))))
+        self.assertEqual(list(self.words_dict.translations), [1, 2, 3])
+        self.assertEqual(self.words_dict.get_groups(), {u'basics', u'food'})
+        self.words_dict.apply_filter(GroupFilter({u'food'}))
+        self.assertEqual(list(self.words_dict.translations), [1, 3])
+
+    def test_homographs(self):
+        with open(self.dict_path, 'ab') as dict_file:
+            dict_file.write('Woda;o refrigerante;basics2\n')
+        import_csv(self.dict_path, self.db_path)
+        words_dict = WordsDict.from_path(self.db_path)
+        words_dict.store.iter_values = None
+        homographs = words_dict.get_homographs(u'pl')
+        self.assertEqual(homographs.get(u'woda'), (3, 5))
+        self.assertIsNone(homographs.get(u'kobieta'))
+        tests_engine = WordsTestEngine(words_dict, u'pl', u'br')
+        self.assertEqual(tests_engine.get_expected_answers(words_dict[3]), [u'a água', u'o refrigerante'])
+        words_dict.store.close()
+
+    def test_main_pushdown(self):
+        argv = ['--dict', self.db_path, '--ask', 'pl', '--ans', 'br', '-n', '1', '--groups', 'food',
+                '--recent', '1', '--seed', '1', '--once', '--output', 'json',
+                '--results-log', os.path.join(self.tmp_dir, 'results.log')]
+        methods = (SqliteStore.get_group, SqliteStore.iter_values)
+        streams = (sys.stdin, sys.stdout, sys.stderr)
+        SqliteStore.get_group = SqliteStore.iter_values = None
+        sys.stdin = StringIO.StringIO('a água\n')
+        sys.stdout = StringIO.StringIO()
+        sys.stderr = StringIO.StringIO()
+        try:
+            repeat_pl_br.main(argv)
+            records = [json.loads(line) for line in sys.stdout.getvalue().splitlines()]
+        finally:
+            SqliteStore.get_group, SqliteStore.iter_values = methods
+            sys.stdin, sys.stdout, sys.stderr = streams
+            communication.set_io()
+        self.assertEqual([(record[u'question'], record[u'correct']) for record in records[:1]], [(u'woda', True)])
+
+    def test_old_database(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.execute('DROP TABLE homographs')
+        connection.close()
+        with self.assertRaises(ValueError):
+            SqliteStore(self.db_path)
+
+    def test_wrong_fields(self):
+        with open(self.dict_path, 'ab') as dict_file:
+            dict_file.write('kot;basics\n')
+        with self.assertRaises(ValueError):
+            import_csv(self.dict_path, self.db_path)
+        self.assertEqual(len(WordsDict.from_path(self.db_path)), 5)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['translations.csv', 'translations.sqlite'])
+
+
+class SyntheticDictionaryTests(unittest.TestCase):
+    def test_generate(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            dict_path = os.path.join(tmp_dir, 'synthetic.csv')
+            generate_dictionary(dict_path, 120)
+            words_dict = WordsDict.from_file(dict_path)
+            self.assertEqual(len(words_dict), 120)
+            self.assertEqual(words_dict.get_langs(), ['pl', 'br', 'en'])
+            self.assertTrue(1 < len(words_dict.get_groups()) <= 120)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_compare(self):
+        baseline = {u'ops_per_s': 100.0, u'peak_kb': 1000}
+        self.assertNotIn(u'REGRESSION', compare({u'ops_per_s': 90.0, u'peak_kb': 1100}, baseline))
+        self.assertIn(u'SPEED REGRESSION', compare({u'ops_per_s': 50.0, u'peak_kb': 1000}, baseline))
+        self.assertIn(u'MEMORY REGRESSION', compare({u'ops_per_s': 100.0, u'peak_kb': 1500}, baseline))
+        self.assertEqual(compare({u'ops_per_s': 100.0, u'peak_kb': 1000}, None), u'')
+
+
+class DictWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+        self.write('pl;br;group\nkobieta;a mulher|a senhora;basics\n', 'wb')
+        self.watcher = DictWatcher(self.dict_path, check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, data, mode='ab'):
+        with open(self.dict_path, mode) as dict_file:
+            dict_file.write(data)
+
+    def test_unchanged(self):
+        words_dict = self.watcher.words_dict
+        self.assertFalse(self.watcher.check_if_due())
+        self.assertIs(self.watcher.words_dict, words_dict)
+
+    def test_appended(self):
+        old_dict = self.watcher.words_dict
+        self.write('dzień;o dia;basics2\nwoda;a ')
+        self.assertTrue(self.watcher.check())
+        new_dict = self.watcher.words_dict
+        self.assertEqual(len(old_dict), 1)
+        self.assertEqual(len(new_dict), 2)
+        self.assertEqual(new_dict.get_groups(), {u'basics', u'basics2'})
+        self.assertEqual(new_dict.get_alternatives(new_dict[0], u'br'), (u'a mulher', u'a senhora'))
+        self.assertEqual(new_dict.get_alternatives(new_dict[1], u'br'), (u'o dia', ))
+
+        self.write('água;food\n')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.words_dict[2], {u'pl': u'woda', u'br': u'a água', u'group': u'food'})
+        self.assertEqual(list(self.watcher.words_dict.store.get_group_rows(u'basics')), [0])
+
+    def test_partial_line(self):
+        words_dict = self.watcher.words_dict
+        self.write('dzień;o d')
+        self.assertFalse(self.watcher.check())
+        self.assertIs(self.watcher.words_dict, words_dict)
+        self.write('ia;basics2\n')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.words_dict[1][u'br'], u'o dia')
+
+    def test_appended_during_reload(self):
+        from_file = WordsDict.from_file
+
+        def append_after_load(path, langs=None, lazy=False):
+            words_dict = from_file(path, langs, lazy)
+            self.write('dzień;o dia;basics2\n')
+            return words_dict
+
+        WordsDict.from_file = staticmethod(append_after_load)
+        try:
+            self.watcher.reload()
+        finally:
+            WordsDict.from_file = staticmethod(from_file)
+        self.assertEqual(len(self.watcher.words_dict), 1)
+        self.assertTrue(self.watcher.check())
+        self.assertEqual([entry[u'pl'] for entry in self.watcher.words_dict], [u'kobieta', u'dzień'])
+
+    def test_edited_and_appended(self):
+        self.write(''.join('w%d;o %d;basics\n' % (row, row) for row in range(500)))
+        self.assertTrue(self.watcher.check())
+        with open(self.dict_path, 'rb') as dict_file:
+            data = dict_file.read()
+        self.write(data.replace('kobieta;', 'Kobieto;') + 'dzień;o dia;basics2\n', 'wb')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.words_dict[0][u'pl'], u'Kobieto')
+        self.assertEqual(len(self.watcher.words_dict), 502)
+
+    def test_rewritten(self):
+        self.write('pl;br;group\ndzień;o dia;basics2\n', 'wb')
+        os.utime(self.dict_path, (0, 0))
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.words_dict[0][u'pl'], u'dzień')
+        self.assertEqual(len(self.watcher.words_dict), 1)
+
+    def test_broken_append(self):
+        words_dict = self.watcher.words_dict
+        self.write('dzień;basics2\n')
+        self.assertFalse(self.watcher.check())
+        self.assertIsNotNone(self.watcher.last_error)
+        self.assertIs(self.watcher.words_dict, words_dict)
+
+
 class WordsTestEngineTests(unittest.TestCase):
     def setUp(self):
         self.multi_lines = [
@@ -131,6 +711,18 @@ class WordsTestEngineTests(unittest.TestCase):
         }
         self.assertEqual(self.test_engine.get_error(dict_entry, answer), expected_error)
 
+    def test_answers_memoized(self):
+        dict_entry = self.test_engine.get_dict_entry(0)
+        self.test_engine.get_error(dict_entry, u'oi')
+        self.assertEqual(self.test_engine.answers_cache[dict_entry.index], ((u'oi', u'olá'), frozenset([u'oi', u'olá'])))
+        self.test_engine.answers_cache[dict_entry.index] = ((u'tchau', ), frozenset([u'tchau']))
+        self.assertIsNone(self.test_engine.get_error(dict_entry, u'Tchau'))
+
+    def test_plain_dict_entry(self):
+        dict_entry = {u'pl': u'dzień', u'br': u'O dia|dia', u'group': u'basics'}
+        self.assertIsNone(self.test_engine.get_error(dict_entry, u'dia'))
+        self.assertEqual(self.test_engine.get_expected_answers(dict_entry), [u'o dia', u'dia'])
+
     def test_precision(self):
         dict_entry = self.test_engine.get_dict_entry(0)
         answer = u'ola'
@@ -142,6 +734,645 @@ class WordsTestEngineTests(unittest.TestCase):
         self.assertEqual(self.test_engine.get_error(dict_entry, answer), expected_error)
 
 
+class HomographsTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'zamek;o castelo;buildings',
+            'pióro;a caneta;school',
+            'Zamek;o fecho|a fechadura;house',
+            'zamek;o castelo;others',
+        ])
+
+    def test_index(self):
+        self.assertEqual(self.words_dict.get_homographs(u'pl'), {u'zamek': (0, 2, 3)})
+        self.assertIs(self.words_dict.view().get_homographs(u'pl'), self.words_dict.get_homographs(u'pl'))
+
+    def test_cached_index(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            dict_path = os.path.join(tmp_dir, 'translations.csv')
+            with open(dict_path, 'wb') as dict_file:
+                dict_file.write('pl;br;group\nzamek;o castelo;buildings\nZamek;o fecho;house\n')
+            lazy_dict = WordsDict.from_file(dict_path, lazy=True)
+            self.assertEqual(lazy_dict.homographs_indexes, {})
+            self.assertEqual(dict_cache.load(dict_path, kind=u'lazy')[u'homographs'], {})
+            self.assertEqual(lazy_dict.get_homographs(u'pl'), {u'zamek': (0, 1)})
+            self.assertEqual(dict_cache.load(dict_path, kind=u'lazy')[u'homographs'], {u'pl': {u'zamek': (0, 1)}})
+            lazy_dict.get_homographs(u'br')
+            for lazy in (False, True):
+                WordsDict.from_file(dict_path, lazy=lazy)
+                words_dict = WordsDict.from_file(dict_path, lazy=lazy)
+                words_dict.store.iter_values = None
+                self.assertEqual(words_dict.get_homographs(u'br'), {})
+                self.assertEqual(WordsTestEngine(words_dict, u'pl', u'br').get_expected_answers(words_dict[0]),
+                                 [u'o castelo', u'o fecho'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_not_built_by_engine(self):
+        WordsTestEngine(self.words_dict, u'pl', u'br')
+        self.assertEqual(self.words_dict.homographs_indexes, {})
+
+    def test_sibling_answers(self):
+        self.words_dict.apply_filter(GroupFilter({u'buildings', u'school'}))
+        tests_engine = WordsTestEngine(self.words_dict, u'pl', u'br')
+        dict_entry = self.words_dict[0]
+        self.assertIsNone(tests_engine.get_error(dict_entry, u'a fechadura'))
+        error = tests_engine.get_error(dict_entry, u'a caneta')
+        self.assertEqual(error[u'expected'], [u'o castelo', u'o fecho', u'a fechadura'])
+        self.assertEqual(tests_engine.get_error(self.words_dict[1], u'o castelo')[u'expected'], [u'a caneta'])
+
+    def test_reverse_direction(self):
+        tests_engine = WordsTestEngine(self.words_dict, u'br', u'pl')
+        self.assertEqual(tests_engine.get_error(self.words_dict[0], u'pióro')[u'expected'], [u'zamek'])
+
+    def test_plain_entries(self):
+        tests_engine = WordsTestEngine(self.words_dict, u'pl', u'br')
+        self.assertIsNone(tests_engine.get_error({u'pl': u'zamek', u'br': u'o castelo'}, u'o fecho'))
+        self.assertIsNotNone(tests_engine.get_error({u'pl': u'pióro', u'br': u'o castelo'}, u'o fecho'))
+
+
+class MultipleChoiceTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'kot;o gato;animals',
+            'pies;o cão|o cachorro;animals',
+            'koń;o cavalo;animals',
+            'mysz;o rato;animals',
+            'słoń;o elefante;animals',
+            'jabłko;a maçã;food',
+            'woda;a água;food',
+            'chleb;o pão;food',
+        ])
+
+    def test_index(self):
+        distractor_index = self.words_dict.get_distractor_index(u'br')
+        self.assertIs(self.words_dict.get_distractor_index(u'br'), distractor_index)
+        self.assertEqual(distractor_index.lengths[u'animals'], [5, 6, 8, 10])
+        self.assertEqual(list(distractor_index.buckets[u'animals'][6]), [0, 3])
+        self.assertEqual(list(distractor_index.iter_lengths(u'animals', 9)), [8, 10, 6, 5])
+        self.assertEqual(list(distractor_index.iter_lengths(None, 7)), [6, 8, 5, 10])
+
+    def test_same_group(self):
+        tests_engine = WordsTestEngine(self.words_dict, u'pl', u'br', seed=1)
+        for _ in range(10):
+            options = tests_engine.get_choices(self.words_dict[0], 3)
+            self.assertEqual(len(options), 3)
+            self.assertIn(u'o gato', options)
+            self.assertTrue(set(options) <= {u'o gato', u'o cão', u'o cavalo', u'o rato', u'o elefante'})
+            self.assertNotIn(u'o elefante', options)
+
+    def test_whole_dictionary(self):
+        tests_engine = WordsTestEngine(self.words_dict, u'pl', u'br', seed=1)
+        options = tests_engine.get_choices(self.words_dict[5], 5)
+        self.assertEqual(len(set(options)), 5)
+        self.assertIn(u'a maçã', options)
+        self.assertEqual(len(tests_engine.get_choices(self.words_dict[5], 20)), 8)
+
+    def test_correct_answers_excluded(self):
+        words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'zamek;o castelo;basics',
+            'zamek;o fecho;basics',
+            'kot;o gato;basics',
+        ])
+        tests_engine = WordsTestEngine(words_dict, u'pl', u'br', seed=1)
+        self.assertEqual(sorted(tests_engine.get_choices(words_dict[0], 3)), [u'o castelo', u'o gato'])
+
+    def test_words_test(self):
+        output = RecordingOutput()
+        words_test = WordsTest(self.words_dict, 1, u'pl', u'br', test_input=ScriptedInput([u'2']),
+                               test_output=output, seed=0, choices=4)
+        words_test.test(False)
+        options = [text for (kind, text) in output.lines if kind == u'text']
+        self.assertEqual(len(options), 4)
+        self.assertTrue(options[1].startswith(u'2) '))
+        answer = [data for (kind, data) in output.lines if kind == u'record'][0][u'answer']
+        self.assertEqual(answer, options[1][3:])
+
+
+class AnswerMatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'woda;a água;food',
+            'jabłko;a maçã|o fruto;food',
+        ])
+        self.matcher = AnswerMatcher(fold_accents=True, strip_articles=True, max_distance=1)
+        self.test_engine = WordsTestEngine(self.words_dict, u'pl', u'br', matcher=self.matcher)
+
+    def test_fold_diacritics(self):
+        self.assertEqual(fold_diacritics(u'a maçã, łódź'), u'a maca, lodz')
+
+    def test_edit_distance(self):
+        self.assertEqual(bounded_edit_distance(u'maca', u'maca', 2), 0)
+        self.assertEqual(bounded_edit_distance(u'maca', u'mcaa', 2), 2)
+        self.assertEqual(bounded_edit_distance(u'', u'ab', 2), 2)
+        self.assertEqual(bounded_edit_distance(u'kitten', u'sitting', 3), 3)
+        self.assertEqual(bounded_edit_distance(u'kitten', u'sitting', 2), 3)
+        self.assertEqual(bounded_edit_distance(u'a', u'abcd', 1), 2)
+
+    def test_exact_by_default(self):
+        test_engine = WordsTestEngine(self.words_dict, u'pl', u'br')
+        self.assertIsNotNone(test_engine.get_error(self.words_dict[0], u'a agua'))
+
+    def test_accents(self):
+        self.assertIsNone(self.test_engine.get_error(self.words_dict[0], u'A agua'))
+
+    def test_articles(self):
+        self.assertIsNone(self.test_engine.get_error(self.words_dict[0], u'água'))
+        self.assertIsNone(self.test_engine.get_error(self.words_dict[1], u'fruto'))
+        self.assertIsNotNone(self.test_engine.get_error(self.words_dict[1], u'um'))
+
+    def test_distance(self):
+        self.assertIsNone(self.test_engine.get_error(self.words_dict[1], u'a maca'))
+        self.assertIsNone(self.test_engine.get_error(self.words_dict[1], u'maçãs'))
+        error = self.test_engine.get_error(self.words_dict[1], u'mamão')
+        self.assertEqual(error[u'expected'], [u'a maçã', u'o fruto'])
+
+
+class GradingTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'cześć;oi|olá;basics',
+            'dzień;o dia;basics',
+        ])
+        self.test_engine = WordsTestEngine(self.words_dict, u'pl', u'br')
+
+    def test_grade_answers(self):
+        answers = [(0, u'Olá'), (u'Dzień', u'dia'), (u'noc', u'a noite')]
+        results = list(grade_answers(self.test_engine, answers))
+        self.assertEqual([result[u'result'] for result in results], [RESULT_OK, RESULT_ERROR, RESULT_UNKNOWN])
+        self.assertEqual(results[1][u'index'], 1)
+        self.assertEqual(results[1][u'expected'], [u'o dia'])
+
+    def test_files(self):
+        answers_file = get_fake_file(['0;oi', 'dzień;o día'])
+        results_file = get_fake_file([])
+        write_results(grade_answers(self.test_engine, read_answers(answers_file)), results_file)
+        self.assertEqual(results_file.getvalue(), '0;cześć;oi;ok;\r\n1;dzień;o día;error;o dia\r\n')
+
+    def test_index_out_of_range(self):
+        answers_file = get_fake_file(['99999;foo', '1;o dia'])
+        results_file = get_fake_file([])
+        write_results(grade_answers(self.test_engine, read_answers(answers_file)), results_file)
+        self.assertEqual(results_file.getvalue(), ';99999;foo;unknown;\r\n1;dzień;o dia;ok;\r\n')
+
+    def test_wrong_languages(self):
+        tmp_dir = tempfile.mkdtemp()
+        dict_path = os.path.join(tmp_dir, 'translations.csv')
+        with open(dict_path, 'wb') as dict_file:
+            dict_file.write('pl;br;group\ncześć;oi;basics\n')
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            for langs in (['polski', 'br'], ['pl', 'portugalski'], ['pl', 'pl']):
+                with self.assertRaises(SystemExit):
+                    grading.main(langs + ['--dict', dict_path])
+        finally:
+            sys.stderr = stderr
+            shutil.rmtree(tmp_dir)
+
+
+class ResultsLogTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.tmp_dir, 'results.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_statistics(self):
+        with ResultsLog(self.log_path) as results_log:
+            results_log.append(0, u'pl', u'br', True, 1.5)
+            results_log.append(0, u'pl', u'br', False, 2.0)
+            results_log.append(3, u'pl', u'br', False, 0.5)
+            results_log.append(0, u'br', u'pl', True, 1.0)
+        with ResultsLog(self.log_path) as results_log:
+            results_log.append(3, u'pl', u'br', True, 0.5)
+
+        self.assertEqual(os.path.getsize(self.log_path), 5 * RECORD.size)
+        self.assertEqual(load_statistics(self.log_path), {
+            (u'pl', u'br'): {0: (2, 1), 3: (2, 1)},
+            (u'br', u'pl'): {0: (1, 0)},
+        })
+        self.assertEqual(load_error_rates(self.log_path, u'br', u'pl'), {0: 0.0})
+
+    def test_buffering(self):
+        results_log = ResultsLog(self.log_path)
+        results_log.append(1, u'pl', u'br', True, 1.0)
+        self.assertFalse(os.path.exists(self.log_path))
+        for _ in range(ResultsLog.BUFFER_RECORDS - 1):
+            results_log.append(1, u'pl', u'br', True, 1.0)
+        self.assertEqual(os.path.getsize(self.log_path), ResultsLog.BUFFER_RECORDS * RECORD.size)
+
+    def test_truncated_record(self):
+        with ResultsLog(self.log_path) as results_log:
+            results_log.append(7, u'pl', u'br', False, 1.0)
+        with open(self.log_path, 'ab') as log_file:
+            log_file.write('\x00\x01')
+        self.assertEqual(load_statistics(self.log_path), {(u'pl', u'br'): {7: (1, 1)}})
+
+    def test_missing_log(self):
+        self.assertEqual(load_statistics(self.log_path), {})
+
+    def test_dictionaries_apart(self):
+        with ResultsLog(self.log_path, u'first') as results_log:
+            results_log.append(0, u'pl', u'br', False, 1.0)
+        with ResultsLog(self.log_path, u'second') as results_log:
+            results_log.append(0, u'pl', u'br', True, 1.0)
+            results_log.append(1, u'pl', u'br', True, 1.0)
+        self.assertEqual(load_error_rates(self.log_path, u'pl', u'br', u'first'), {0: 1.0})
+        self.assertEqual(load_error_rates(self.log_path, u'pl', u'br', u'second'), {0: 0.0, 1: 0.0})
+        self.assertEqual(load_statistics(self.log_path), {})
+
+    def test_pairs_without_dictionary(self):
+        with ResultsLog(self.log_path) as results_log:
+            results_log.append(2, u'pl', u'br', False, 1.0)
+        with open(self.log_path + '.pairs', 'wb') as pairs_file:
+            pairs_file.write('pl;br\n')
+        self.assertEqual(load_pairs(self.log_path), [(u'pl', u'br', u'')])
+        self.assertEqual(load_statistics(self.log_path), {(u'pl', u'br'): {2: (1, 1)}})
+
+
+class StatsTests(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+        stats.enable(report=False)
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'cześć;oi|olá;basics',
+            'dzień;o dia;food',
+        ])
+
+    def tearDown(self):
+        stats.disable()
+        stats.reset()
+
+    def test_pipeline(self):
+        self.words_dict.apply_filter(GroupFilter({u'basics', u'food'}))
+        words_test = WordsTest(self.words_dict, 2, u'pl', u'br', test_input=ScriptedInput([u'oi', u'oi']),
+                               test_output=RecordingOutput())
+        words_test.test(False)
+        summary = stats.get_summary()
+        for name in (u'apply_filter', u'draw', u'get_error', u'response'):
+            self.assertIn(name, summary[u'timings'])
+        self.assertEqual(summary[u'timings'][u'get_error'][u'calls'], 2)
+        self.assertEqual(summary[u'counters'][u'answers'], 2)
+        self.assertEqual(len(stats.format_summary()), 1 + 4 + 2)
+
+    def test_disabled(self):
+        stats.disable()
+        WordsTestEngine(self.words_dict, u'pl', u'br').get_error(self.words_dict[0], u'oi')
+        self.assertEqual(stats.get_summary(), {u'timings': {}, u'counters': {}})
+
+    def test_dump(self):
+        stats.add_time(u'load', 0.5)
+        stats.add_time(u'load', 1.5)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            stats_path = os.path.join(tmp_dir, 'stats.json')
+            stats.dump(stats_path)
+            with open(stats_path, 'rb') as stats_file:
+                dumped = json.load(stats_file)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(dumped[u'timings'][u'load'], {u'calls': 2, u'total': 2.0, u'min': 0.5, u'max': 1.5})
+
+
+class ConsoleOutputTests(unittest.TestCase):
+    def test_buffered(self):
+        stream = StringIO.StringIO()
+        output = ConsoleOutput(stream)
+        output.info(u'cześć')
+        output.error(u'oi')
+        output.record({u'type': u'summary'})
+        self.assertEqual(stream.getvalue(), '')
+        output.flush()
+        self.assertEqual(stream.getvalue().decode('utf-8'), u'cześć\noi\n')
+
+    def test_colors(self):
+        stream = StringIO.StringIO()
+        output = ConsoleOutput(stream, colors=True)
+        output.ok(u'OK')
+        output.write(u'plain')
+        output.flush()
+        self.assertEqual(stream.getvalue(), COLOR_OK + 'OK' + COLOR_ENDING + '\nplain\n')
+
+    def test_full_buffer(self):
+        stream = StringIO.StringIO()
+        output = ConsoleOutput(stream)
+        for _ in range(ConsoleOutput.BUFFER_LINES):
+            output.write(u'-')
+        self.assertEqual(len(stream.getvalue().splitlines()), ConsoleOutput.BUFFER_LINES)
+
+
+class TestSessionTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'cześć;oi|olá;basics',
+            'dzień;o dia;basics',
+        ])
+        self.answers = {u'cześć': u'oi', u'dzień': u'dia'}
+
+    def test_steps(self):
+        test_session = TestSession(WordsTestEngine(self.words_dict, u'pl', u'br'), 5)
+        self.assertEqual(test_session.tests_num, 2)
+        dict_entry = test_session.next_question()
+        self.assertIs(test_session.next_question(), dict_entry)
+        test_session.submit_answer(self.answers[dict_entry[u'pl']])
+        with self.assertRaises(ValueError):
+            test_session.submit_answer(u'oi')
+        dict_entry = test_session.next_question()
+        test_session.submit_answer(self.answers[dict_entry[u'pl']])
+        self.assertTrue(test_session.is_finished())
+        self.assertIsNone(test_session.next_question())
+        summary = test_session.summary()
+        self.assertEqual(summary[u'questions'], 2)
+        self.assertEqual([error[u'question'] for error in summary[u'errors']], [u'dzień'])
+
+    def test_repeat_questions(self):
+        test_session = TestSession(WordsTestEngine(self.words_dict, u'pl', u'br'), 2)
+        first_questions = []
+        while test_session.next_question() is not None:
+            first_questions.append(test_session.next_question())
+            test_session.submit_answer(u'?')
+        test_session.start(use_cache=True)
+        self.assertEqual(test_session.summary()[u'errors'], [])
+        second_questions = []
+        while test_session.next_question() is not None:
+            second_questions.append(test_session.next_question())
+            test_session.submit_answer(u'?')
+        self.assertEqual(second_questions, first_questions)
+
+    def test_scripted_words_test(self):
+        words_test = WordsTest(self.words_dict, 2, u'pl', u'br', test_input=ScriptedInput([u'oi', u'oi']),
+                               test_output=RecordingOutput())
+        words_test.test(False)
+        kinds = [kind for (kind, _) in words_test.output.lines]
+        self.assertEqual(kinds.count(u'info'), 2)
+        self.assertIn(u'ok', kinds)
+        self.assertEqual(kinds[-1], u'error')
+
+    def test_json_results(self):
+        records = StringIO.StringIO()
+        messages = RecordingOutput()
+        words_test = WordsTest(self.words_dict, 2, u'pl', u'br', test_input=ScriptedInput([u'oi', u'oi']),
+                               test_output=JsonLinesOutput(records, messages))
+        words_test.test(False)
+        results = [json.loads(line) for line in records.getvalue().splitlines()]
+        self.assertEqual([result[u'type'] for result in results], [u'answer', u'answer', u'summary'])
+        self.assertEqual(sorted(result[u'correct'] for result in results[:2]), [False, True])
+        self.assertEqual(results[-1][u'errors'], 1)
+        self.assertNotIn(u'record', [kind for (kind, _) in messages.lines])
+
+    def test_scripted_parameters(self):
+        communication.set_io(ScriptedInput([u'1', u'1', u'1', u'1', u'']), RecordingOutput())
+        try:
+            parameters = communication.get_test_parameters(self.words_dict)
+        finally:
+            communication.set_io()
+        self.assertEqual(parameters, (1, 'pl', 'br', {u'basics'}, 2))
+
+
+class CommandLineTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dict_path = os.path.join(self.tmp_dir, 'translations.csv')
+        with open(self.dict_path, 'wb') as dict_file:
+            dict_file.write('pl;br;group\ncześć;oi|olá;basics\ndzień;o dia;basics\nwoda;a água;food\n')
+        self.words_dict = WordsDict.from_file(self.dict_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_partial_parameters(self):
+        output = RecordingOutput()
+        communication.set_io(ScriptedInput([u'1']), output)
+        try:
+            parameters = communication.get_test_parameters(self.words_dict, 2, None, 'br', {u'food'}, 3)
+        finally:
+            communication.set_io()
+        self.assertEqual(parameters, (2, 'pl', 'br', {u'food'}, 3))
+        self.assertEqual(output.lines, [(u'text', u'Choose questions language'), (u'text', u'1) pl')])
+
+    def test_batch_run(self):
+        argv = ['--dict', self.dict_path, '--ask', 'pl', '--ans', 'br', '-n', '3', '--groups', 'basics',
+                '--recent', '3', '--seed', '1', '--once', '--output', 'json', '--fold-accents',
+                '--results-log', os.path.join(self.tmp_dir, 'results.log')]
+        streams = (sys.stdin, sys.stdout, sys.stderr)
+        sys.stdin = StringIO.StringIO('oi\ndia\n')
+        sys.stdout = StringIO.StringIO()
+        sys.stderr = StringIO.StringIO()
+        try:
+            repeat_pl_br.main(argv)
+            records = [json.loads(line) for line in sys.stdout.getvalue().splitlines()]
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = streams
+            communication.set_io()
+        self.assertEqual([record[u'type'] for record in records], [u'answer', u'answer', u'summary'])
+        self.assertEqual({record[u'question'] for record in records[:2]}, {u'cześć', u'dzień'})
+        self.assertEqual(records[-1][u'questions'], 2)
+
+    def test_different_parameters(self):
+        argv = ['--dict', self.dict_path, '--ask', 'pl', '--ans', 'br', '-n', '1', '--groups', 'food',
+                '--recent', '3', '--seed', '1', '--output', 'json',
+                '--results-log', os.path.join(self.tmp_dir, 'results.log')]
+        streams = (sys.stdin, sys.stdout, sys.stderr)
+        sys.stdin = StringIO.StringIO('a água\n3\n1\n2\n1\n1-2\n\nwoda\n4\n')
+        sys.stdout = StringIO.StringIO()
+        sys.stderr = StringIO.StringIO()
+        try:
+            repeat_pl_br.main(argv)
+            records = [json.loads(line) for line in sys.stdout.getvalue().splitlines()]
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = streams
+            communication.set_io()
+        answers = [record for record in records if record[u'type'] == u'answer']
+        self.assertEqual(answers[0][u'question'], u'woda')
+        self.assertIn(answers[1][u'question'], {u'oi|olá', u'o dia', u'a água'})
+        self.assertEqual(len(answers), 2)
+
+    def test_wrong_arguments(self):
+        parser = repeat_pl_br.make_parser()
+        for argv in (['--ask', 'de'], ['--ask', 'pl', '--ans', 'pl'], ['--groups', 'unknown'], ['-n', '0']):
+            args = parser.parse_args(argv)
+            stderr = sys.stderr
+            sys.stderr = StringIO.StringIO()
+            try:
+                with self.assertRaises(SystemExit):
+                    repeat_pl_br.check_arguments(parser, args, self.words_dict)
+            finally:
+                sys.stderr = stderr
+
+
+class QuizSessionTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'cześć;oi|olá;basics',
+            'woda;a água;food',
+        ])
+        self.session = QuizSession(self.words_dict)
+
+    def test_langs_and_groups(self):
+        self.assertEqual(self.session.handle_line(u'LANGS'), [u'LANGS pl br'])
+        self.assertEqual(self.session.handle_line(u'GROUPS'), [u'GROUPS basics|food'])
+
+    def test_quiz(self):
+        self.assertEqual(self.session.handle_line(u'START pl br 5 food'), [u'QUESTION woda'])
+        self.assertEqual(len(self.words_dict), 2)
+        self.assertEqual(self.session.handle_line(u'ANSWER a agua'), [u'ERROR a água', u'DONE 1 1'])
+        self.assertEqual(self.session.handle_line(u'ANSWER a água')[0], u'FAIL no question asked')
+        self.assertEqual(self.session.handle_line(u'QUIT'), [u'BYE'])
+        self.assertTrue(self.session.finished)
+
+    def test_unfiltered_start_shares_indices(self):
+        self.assertEqual(self.session.handle_line(u'START pl br 1')[0][:len(u'QUESTION')], u'QUESTION')
+        self.assertIs(self.session.test_session.tests_engine.words_dict.translations, self.words_dict.all_indices)
+
+    def test_wrong_commands(self):
+        self.assertEqual(self.session.handle_line(u'HELLO'), [u'FAIL unknown command HELLO'])
+        self.assertEqual(self.session.handle_line(u'START pl de'), [u'FAIL unknown language'])
+        self.assertEqual(self.session.handle_line(u'START pl br 0'), [u'FAIL number of questions must be positive'])
+
+
+class FakeCatalog(gettext.NullTranslations):
+    def __init__(self, messages):
+        gettext.NullTranslations.__init__(self)
+        self.messages = messages
+
+    def ugettext(self, message):
+        return self.messages.get(message, message)
+
+
+class I18nTests(unittest.TestCase):
+    def setUp(self):
+        self.translations = i18n.translations.copy()
+        i18n.translations[u'pl'] = FakeCatalog({u'no questions': u'brak pytań', u'unknown command %s': u'nieznane polecenie %s'})
+
+    def tearDown(self):
+        i18n.translations.clear()
+        i18n.translations.update(self.translations)
+        i18n.set_language(None)
+
+    def test_cached_catalog(self):
+        self.assertNotIn(u'xx', i18n.translations)
+        catalog = i18n.get_translation(u'xx')
+        self.assertIs(i18n.get_translation(u'xx'), catalog)
+        self.assertEqual(catalog.ugettext(u'no questions'), u'no questions')
+
+    def test_switch_language(self):
+        self.assertEqual(i18n.ugettext(u'no questions'), u'no questions')
+        i18n.set_language(u'pl')
+        self.assertEqual(i18n.ugettext(u'no questions'), u'brak pytań')
+        self.assertEqual(i18n.Translator(u'xx')(u'no questions'), u'no questions')
+        i18n.set_language(None)
+        self.assertEqual(i18n.Translator(u'pl')(u'no questions'), u'brak pytań')
+
+    def test_session_language(self):
+        words_dict = WordsDict.from_string_io(['pl;br;group', 'woda;a água;food'])
+        polish_session = QuizSession(words_dict)
+        session = QuizSession(words_dict)
+        self.assertEqual(polish_session.handle_line(u'LANGUAGE pl'), [u'LANGUAGE pl'])
+        self.assertEqual(polish_session.handle_line(u'START pl br 1 basics'), [u'FAIL brak pytań'])
+        self.assertEqual(polish_session.handle_line(u'HELLO'), [u'FAIL nieznane polecenie HELLO'])
+        self.assertEqual(session.handle_line(u'START pl br 1 basics'), [u'FAIL no questions'])
+
+    def test_server_messages_translated(self):
+        with open(os.path.join(i18n.LOCALE_DIR, 'pl', 'LC_MESSAGES', i18n.APP_NAME + '.po'), 'rb') as po_file:
+            catalog = dict(re.findall(r'^msgid "(.+)"\nmsgstr "(.+)"$', po_file.read(), re.M))
+        with open(server.__file__.replace('.pyc', '.py'), 'rb') as server_file:
+            messages = re.findall(r"N_\(u'([^']+)'\)", server_file.read())
+        self.assertTrue(messages)
+        self.assertEqual([message for message in messages if message not in catalog], [])
+
+
+class QuizServerTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'cześć;oi|olá;basics',
+            'dzień;o dia;basics',
+        ])
+        self.server = QuizServer(self.words_dict, port=0)
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.close_all()
+
+    def connect(self):
+        client = socket.create_connection(('localhost', self.server.get_port()))
+        client.setblocking(False)
+        self.clients.append(client)
+        return client
+
+    def exchange(self, client, line, lines_count=1):
+        client.sendall(line + '\n')
+        received = ''
+        for _ in range(1000):
+            self.server.serve(timeout=0.01, count=1)
+            try:
+                received += client.recv(4096)
+            except socket.error:
+                pass
+            if received.count('\n') >= lines_count:
+                break
+        return received.splitlines()
+
+    def test_concurrent_sessions(self):
+        first_client = self.connect()
+        second_client = self.connect()
+        first_question = self.exchange(first_client, 'START pl br 1')[0]
+        second_question = self.exchange(second_client, 'START br pl 2')[0]
+        self.assertIn(first_question, ['QUESTION cześć', 'QUESTION dzień'])
+        self.assertIn(second_question, ['QUESTION oi|olá', 'QUESTION o dia'])
+
+        answer = 'ANSWER oi' if first_question == 'QUESTION cześć' else 'ANSWER o dia'
+        self.assertEqual(self.exchange(first_client, answer, 2), ['OK', 'DONE 0 1'])
+        self.assertEqual(self.exchange(second_client, 'ANSWER ?', 2)[1][:len('QUESTION')], 'QUESTION')
+        self.assertEqual(self.exchange(first_client, 'QUIT'), ['BYE'])
+
+    def test_many_sessions(self):
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        clients_count = 1100
+        if hard_limit != resource.RLIM_INFINITY and hard_limit < 2 * clients_count + 100:
+            self.skipTest(u'too low limit of open files')
+        resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft_limit, 2 * clients_count + 100), hard_limit))
+        try:
+            for _ in range(clients_count):
+                self.connect()
+            for _ in range(10 * clients_count):
+                if len(self.server.socket_map) > clients_count:
+                    break
+                self.server.serve(timeout=0.01, count=1)
+            self.assertEqual(len(self.server.socket_map), clients_count + 1)
+            self.assertEqual(self.exchange(self.clients[-1], 'LANGS'), ['LANGS pl br'])
+        finally:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+            self.server.close_all()
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+
+    def test_watch_directory(self):
+        tmp_dir = tempfile.mkdtemp()
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                server.main(['--dict', tmp_dir, '--watch', '--port', '0'])
+        finally:
+            sys.stderr = stderr
+            shutil.rmtree(tmp_dir)
+
+
 class SimpleRandomizerTests(unittest.TestCase):
     def setUp(self):
         self.first = 0
@@ -184,6 +1415,143 @@ class AvoidRepeatRandomizerTests(unittest.TestCase):
         self.assertEqual(len(drawn_numbers), numbers_count)
 
 
+class SeededRandomizerTests(unittest.TestCase):
+    def draw(self, randomizer, count):
+        return [randomizer.next_random() for _ in range(count)]
+
+    def test_same_seed(self):
+        for randomizer_class in (SimpleRandomizer, AvoidRepeatRandomizer):
+            first_numbers = self.draw(randomizer_class(5, 1000, seed=7), 50)
+            second_numbers = self.draw(randomizer_class(5, 1000, seed=7), 50)
+            self.assertEqual(first_numbers, second_numbers)
+
+    def test_reset(self):
+        randomizer = AvoidRepeatRandomizer(5, 9, seed=1)
+        self.draw(randomizer, 3)
+        randomizer.reset()
+        self.assertEqual(randomizer.swapped, {})
+        self.assertEqual(sorted(self.draw(randomizer, 5)), [5, 6, 7, 8, 9])
+
+    def test_large_range(self):
+        randomizer = AvoidRepeatRandomizer(0, 10 ** 9, seed=3)
+        numbers = self.draw(randomizer, 1000)
+        self.assertEqual(len(set(numbers)), 1000)
+        self.assertLessEqual(len(randomizer.swapped), 1000)
+
+
+class SpacedRepetitionRandomizerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, 'state.json')
+        self.now = 1000.0
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'kobieta;a mulher;basics',
+            'dzień;o dia;basics',
+            'woda;a água;food',
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_engine(self):
+        def randomizer_factory(first, last, seed):
+            return SpacedRepetitionRandomizer(first, last, seed, path=self.state_path, clock=lambda: self.now)
+        return WordsTestEngine(self.words_dict, u'pl', u'br', randomizer_factory=randomizer_factory)
+
+    def answer(self, test_engine, answers):
+        dict_entry = test_engine.get_dict_entry()
+        test_engine.get_error(dict_entry, answers[dict_entry[u'pl']])
+        return dict_entry[u'pl']
+
+    def test_errors_first(self):
+        test_engine = self.make_engine()
+        answers = {u'kobieta': u'a mulher', u'dzień': u'?', u'woda': u'a água'}
+        asked = [self.answer(test_engine, answers) for _ in range(3)]
+        self.assertEqual(sorted(asked), sorted(answers))
+        self.assertEqual(self.answer(test_engine, answers), u'dzień')
+
+    def test_due_order(self):
+        test_engine = self.make_engine()
+        answers = {u'kobieta': u'a mulher', u'dzień': u'o dia', u'woda': u'a água'}
+        for _ in range(3):
+            self.answer(test_engine, answers)
+        self.now += SpacedRepetitionRandomizer.DAY
+        due = {self.answer(test_engine, answers) for _ in range(3)}
+        self.assertEqual(due, set(answers))
+
+    def test_error_rate_priority(self):
+        randomizer = SpacedRepetitionRandomizer(0, 1, clock=lambda: self.now)
+        randomizer.record(1, True)
+        randomizer.record(0, False)
+        self.now += 100
+        randomizer.record(0, True)
+        self.now = 1000.0 + SpacedRepetitionRandomizer.DAY
+        self.assertEqual(randomizer.pop_due(self.now), 0)
+        self.assertEqual(randomizer.pop_due(self.now), 1)
+
+    def test_corrupt_state(self):
+        with open(self.state_path, 'wb') as state_file:
+            state_file.write('{"kobieta;a mulher": [10')
+        test_engine = self.make_engine()
+        self.assertEqual(test_engine.randomizer.items, {})
+
+    def test_persistence(self):
+        test_engine = self.make_engine()
+        answers = {u'kobieta': u'?', u'dzień': u'o dia', u'woda': u'a água'}
+        for _ in range(3):
+            self.answer(test_engine, answers)
+        test_engine.save_state()
+
+        self.now += SpacedRepetitionRandomizer.DAY / 2
+        self.words_dict.apply_filter(CountFilter(3))
+        test_engine = self.make_engine()
+        self.assertEqual(len(test_engine.randomizer.queue), 3)
+        self.assertEqual(self.answer(test_engine, answers), u'kobieta')
+        state = test_engine.randomizer.items[u'kobieta;a mulher']
+        self.assertEqual(state[SpacedRepetitionRandomizer.ERRORS], 2)
+
+    def test_position(self):
+        self.words_dict.apply_filter(GroupFilter({u'food'}))
+        self.assertEqual(self.words_dict.get_position(self.words_dict[0]), 0)
+        self.assertIsNone(self.words_dict.get_position(self.words_dict.all_translations[0]))
+        self.assertIsNone(self.words_dict.get_position({u'pl': u'woda'}))
+
+
+class WeightedRandomizerTests(unittest.TestCase):
+    def test_fenwick_tree(self):
+        weights = [0.5, 0.0, 2.0, 1.0, 0.5]
+        tree = FenwickTree(weights)
+        self.assertEqual(tree.total, 4.0)
+        self.assertEqual([tree.find(value) for value in (0.0, 0.49, 0.5, 2.49, 2.5, 3.6, 4.0)], [0, 0, 2, 2, 3, 4, 4])
+        tree.add(1, 1.0)
+        self.assertEqual([tree.find(value) for value in (0.5, 1.49, 1.5)], [1, 1, 2])
+        self.assertEqual(tree.total, 5.0)
+
+    def test_range(self):
+        randomizer = WeightedRandomizer(3, 7, seed=0)
+        self.assertEqual({randomizer.next_random() for _ in range(200)}, {3, 4, 5, 6, 7})
+
+    def test_errors_drawn_more(self):
+        randomizer = WeightedRandomizer(0, 3, seed=0)
+        randomizer.record(2, False)
+        randomizer.record(1, True)
+        self.assertEqual(list(randomizer.weights), [1.0, 1.0, 5.0, 1.0])
+        draws = [randomizer.next_random() for _ in range(4000)]
+        self.assertTrue(draws.count(2) > 2 * draws.count(0))
+        randomizer.record(2, True)
+        self.assertEqual(randomizer.weights[2], 3.0)
+
+    def test_past_error_rates(self):
+        words_dict = WordsDict.from_string_io(['pl;br;group', 'kot;o gato;a', 'pies;o cão;b', 'koń;o cavalo;b'])
+        words_dict.apply_filter(GroupFilter({u'b'}))
+        tests_engine = WordsTestEngine(words_dict, u'pl', u'br', seed=0, randomizer_factory=WeightedRandomizer)
+        tests_engine.set_error_rates({0: 1.0, 2: 0.5})
+        self.assertEqual(list(tests_engine.randomizer.weights), [1.0, 3.0])
+        tests_engine.get_error(words_dict[1], u'o cavalo')
+        self.assertEqual(list(tests_engine.randomizer.weights), [1.0, 2.0])
+
+
 class CountFilterTests(unittest.TestCase):
     def setUp(self):
         self.translations = [
@@ -309,5 +1677,58 @@ class MixedFilterTests(unittest.TestCase):
         self.assertEqual(filtered, self.translations[-1:])
 
 
+
+class IndexFilterTests(unittest.TestCase):
+    def setUp(self):
+        self.words_dict = WordsDict.from_string_io([
+            'pl;br;group',
+            'kobieta;a mulher;basics',
+            'jabłko;a maçã;food',
+            'dziewczyna;a menina;basics',
+            'woda;a água;food',
+            'chłopiec;o menino;basics2',
+        ])
+
+    def entries(self):
+        return [entry[u'pl'] for entry in self.words_dict]
+
+    def test_group_index(self):
+        self.words_dict.apply_filter(GroupFilter({u'basics', u'basics2'}))
+        self.assertEqual(list(self.words_dict.translations), [0, 2, 4])
+        self.assertEqual(self.entries(), [u'kobieta', u'dziewczyna', u'chłopiec'])
+
+    def test_group_and_count(self):
+        self.words_dict.apply_filter(GroupFilter({u'basics', u'food', u'unknown'}).link(CountFilter(3)))
+        self.assertEqual(list(self.words_dict.translations), [1, 2, 3])
+
+    def test_count_and_group(self):
+        self.words_dict.apply_filter(CountFilter(3).link(GroupFilter({u'food'})))
+        self.assertEqual(self.entries(), [u'woda'])
+
+    def test_zero_count(self):
+        self.words_dict.apply_filter(CountFilter(0))
+        self.assertEqual(len(self.words_dict), 0)
+
+    def test_langs_group_count_chain(self):
+        def get_group(index):
+            self.fail(u'rows scanned instead of using the group index')
+        self.words_dict.store.get_group = get_group
+        self.words_dict.apply_filter(LangsFilter((u'pl', u'br')).link(
+            GroupFilter({u'basics', u'food'}).link(CountFilter(3))))
+        self.assertEqual(list(self.words_dict.translations), [1, 2, 3])
+
+    def test_langs_filter_keeps_all_indices(self):
+        self.words_dict.apply_filter(LangsFilter((u'pl', u'br')))
+        self.assertIs(self.words_dict.translations, self.words_dict.all_indices)
+        self.assertEqual(NoFilter().filter([{u'group': u'basics'}]), [{u'group': u'basics'}])
+
+    def test_filter_filtered(self):
+        self.words_dict.apply_filter(GroupFilter({u'basics'}))
+        self.words_dict.apply_filter(CountFilter(1))
+        self.assertEqual(self.entries(), [u'dziewczyna'])
+        self.words_dict.apply_filter(NoFilter())
+        self.assertEqual(self.entries(), [u'dziewczyna'])
+
+
 if __name__ == '__main__':
     unittest.main()
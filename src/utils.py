@@ -3,6 +3,8 @@
 
 
 import cStringIO
+import json
+import sys
 
 
 COLOR_INFO = '\033[94m'
@@ -12,27 +14,88 @@ COLOR_ERROR = '\033[91m'
 COLOR_ENDING = '\033[0m'
 
 
-def print_info(text):
-    print COLOR_INFO + text + COLOR_ENDING
+def get_fake_file(lines):
+    output = cStringIO.StringIO()
+    for line in lines:
+        ended_line = line if line.endswith('\n') else line + '\n'
+        output.write(ended_line)
 
+    output.seek(0)
+    return output
 
-def print_ok(text):
-    print COLOR_OK + text + COLOR_ENDING
 
+class ConsoleOutput(object):
+    '''Buffered text output, colored only when written to a terminal.
 
-def print_warning(text):
-    print COLOR_WARNING + text + COLOR_ENDING
+    Lines are written in batches - flush before reading from the user, so questions are visible.
+    '''
 
+    BUFFER_LINES = 256
 
-def print_error(text):
-    print COLOR_ERROR + text + COLOR_ENDING
+    def __init__(self, stream=None, colors=None):
+        self.stream = sys.stdout if stream is None else stream
+        self.colors = is_tty(self.stream) if colors is None else colors
+        self.buffer = []
 
+    def write(self, text, color=None):
+        if color and self.colors:
+            text = color + text + COLOR_ENDING
+        self.buffer.append(text.encode('utf-8') if isinstance(text, unicode) else text)
+        if len(self.buffer) >= self.BUFFER_LINES:
+            self.flush()
 
-def get_fake_file(lines):
-    output = cStringIO.StringIO()
-    for line in lines:
-        ended_line = line if line.endswith('\n') else line + '\n'
-        output.write(ended_line)
+    def info(self, text):
+        self.write(text, COLOR_INFO)
 
-    output.seek(0)
-    return output
+    def ok(self, text):
+        self.write(text, COLOR_OK)
+
+    def warning(self, text):
+        self.write(text, COLOR_WARNING)
+
+    def error(self, text):
+        self.write(text, COLOR_ERROR)
+
+    def record(self, data):
+        '''Structured result - people read the messages instead.'''
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.stream.flush()
+
+
+class JsonLinesOutput(object):
+    '''Writes results as JSON objects, one per line, and passes messages to another output.'''
+
+    def __init__(self, stream=None, messages=None):
+        self.records = ConsoleOutput(stream, colors=False)
+        self.messages = ConsoleOutput(sys.stderr) if messages is None else messages
+
+    def write(self, text):
+        self.messages.write(text)
+
+    def info(self, text):
+        self.messages.info(text)
+
+    def ok(self, text):
+        self.messages.ok(text)
+
+    def warning(self, text):
+        self.messages.warning(text)
+
+    def error(self, text):
+        self.messages.error(text)
+
+    def record(self, data):
+        self.records.write(json.dumps(data, ensure_ascii=False, sort_keys=True))
+
+    def flush(self):
+        self.messages.flush()
+        self.records.flush()
+
+
+def is_tty(stream):
+    isatty = getattr(stream, u'isatty', None)
+    return bool(isatty and isatty())
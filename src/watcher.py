@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import cStringIO
+import csv
+import hashlib
+import os
+import time
+
+import dict_cache
+from repeat_pl_br import WordsDict
+from storage import select_columns, to_utf8
+
+
+def hash_prefix(source_file, size):
+    '''Returns md5 of the next size bytes of the file.'''
+    prefix_hash = hashlib.md5()
+    remaining = size
+    while remaining > 0:
+        chunk = source_file.read(min(remaining, dict_cache.HASH_CHUNK_SIZE))
+        if not chunk:
+            break
+        prefix_hash.update(chunk)
+        remaining -= len(chunk)
+    return prefix_hash
+
+
+class DictWatcher(object):
+    '''Keeps the newest snapshot of a dictionary file in words_dict.
+
+    Snapshots are never modified - a change creates a new WordsDict and swaps the reference, so
+    anybody holding the previous one keeps a consistent view. When the file was only appended to,
+    just the new lines are parsed and added to a copy of the current snapshot - the previous content
+    is compared by its md5, which costs reading the file but no parsing.
+    '''
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, path, langs=None, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.langs = langs
+        self.check_interval = check_interval
+        self.last_check = time.time()
+        self.last_error = None
+        self.reload()
+
+    def reload(self):
+        with open(self.path, u'rb') as dict_file:
+            # Size is taken before loading - lines appended meanwhile are left for load_appended
+            size = os.fstat(dict_file.fileno()).st_size
+            words_dict = WordsDict.from_file(self.path, self.langs)
+            if os.fstat(dict_file.fileno()).st_size != size:
+                # The load may or may not have seen the appended lines - complete lines up to size are parsed again
+                data = dict_file.read(size)
+                data = data[:data.rfind('\n') + 1]
+                size = len(data)
+                words_dict = WordsDict(csv.reader(cStringIO.StringIO(data), delimiter=';'), self.langs)
+            dict_file.seek(0)
+            header = next(csv.reader(dict_file, delimiter=';'))
+            self.remember_position(dict_file, size)
+        self.words_dict = words_dict
+        self.header = header
+        self.columns = select_columns(self.header, WordsDict.GROUP_KEY, self.langs)
+
+    def remember_position(self, dict_file, size, prefix_hash=None):
+        stat = os.fstat(dict_file.fileno())
+        self.size = size
+        self.mtime = stat.st_mtime
+        if prefix_hash is None:
+            dict_file.seek(0)
+            prefix_hash = hash_prefix(dict_file, size)
+        self.prefix_hash = prefix_hash
+        dict_file.seek(max(0, size - 1))
+        self.ends_line = dict_file.read(min(1, size)) == '\n'
+
+    def check_if_due(self):
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return False
+        self.last_check = now
+        return self.check()
+
+    def check(self):
+        '''Returns True if a new snapshot was loaded.'''
+        try:
+            stat = os.stat(self.path)
+            if stat.st_size == self.size and stat.st_mtime == self.mtime:
+                return False
+
+            loaded = self.load_appended(stat.st_size)
+            if loaded is None:
+                self.reload()
+                loaded = True
+        except (IOError, OSError, ValueError) as error:
+            # Broken or half written file - the current snapshot is still served
+            self.last_error = error
+            return False
+
+        self.last_error = None
+        return loaded
+
+    def load_appended(self, size):
+        '''Returns True if appended rows were added, False if only a part of a line was appended so far.
+
+        None means the file was not just appended to and has to be reloaded.
+        '''
+        if size <= self.size or not self.ends_line:
+            return None
+
+        with open(self.path, u'rb') as dict_file:
+            if hash_prefix(dict_file, self.size).digest() != self.prefix_hash.digest():
+                return None
+            appended = dict_file.read(size - self.size)
+            # A line still being written is left for the next check
+            complete_size = appended.rfind('\n') + 1
+            if not complete_size:
+                return False
+            rows = self.parse_rows(appended[:complete_size])
+            self.words_dict = self.words_dict.extended(rows)
+            prefix_hash = self.prefix_hash.copy()
+            prefix_hash.update(appended[:complete_size])
+            self.remember_position(dict_file, self.size + complete_size, prefix_hash)
+        return True
+
+    def parse_rows(self, data):
+        rows = []
+        csv_reader = csv.reader(cStringIO.StringIO(data), delimiter=';')
+        for line in csv_reader:
+            if len(self.header) != len(line):
+                raise ValueError(u'WordsDict - wrong fields (%s) number in appended line %d.' %
+                                 (line, csv_reader.line_num))
+            rows.append([to_utf8(line[column]) for column in self.columns])
+        return rows
@@ -13,7 +13,7 @@ TEMPLATE_FILE="$I18N_DIR/$PROJECT_NAME.pot"
 PO_FILE="$I18N_DIR/$LANG/LC_MESSAGES/$PROJECT_NAME.po"
 
 # Create translation template
-xgettext --language=Python --keyword=_ "--output=$TEMPLATE_FILE" `find . -name "*.py"`
+xgettext --language=Python --keyword=_ --keyword=N_ "--output=$TEMPLATE_FILE" `find . -name "*.py"`
 sed -i 's/CHARSET/utf-8/' $TEMPLATE_FILE
 
 # Update translations